@@ -10,13 +10,15 @@ Installation:
     uv pip install -r requirements-clustering.txt
 
 Usage:
-    python cluster_documents.py <user_id> [--min-cluster-size N] [--min-samples N] [--db-path PATH] [--include-tree] [--tree-viewer PATH]
+    python cluster_documents.py <user_id> [--min-cluster-size N] [--min-samples N] [--db-path PATH] [--include-tree] [--tree-viewer PATH] [--gpu] [--cache-dir DIR]
 
 Examples:
     python cluster_documents.py user123
     python cluster_documents.py user123 --min-cluster-size 10 --min-samples 10
     python cluster_documents.py user123 --db-path backend/data/berkdoc.db
     python cluster_documents.py user123 --include-tree --tree-viewer tree.html
+    python cluster_documents.py user123 --gpu  # requires cuML + CuPy (RAPIDS)
+    python cluster_documents.py user123 --cache-dir .cache  # reuse embeddings of unchanged documents
     
     # Or generate tree viewer separately from existing JSON:
     python generate_tree_viewer.py results.json tree.html
@@ -28,14 +30,19 @@ import os
 import sqlite3
 import sys
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 
 import hdbscan
 import numpy as np
+import orjson
 import weaviate
+from weaviate.classes.aggregate import GroupByAggregate
 from weaviate.classes.query import Filter
 from dotenv import load_dotenv
 
+from generate_tree_viewer import create_tree_viewer_html
+
 # Load environment variables
 load_dotenv()
 
@@ -43,9 +50,16 @@ load_dotenv()
 DEFAULT_WEAVIATE_HOST = os.getenv("WEAVIATE_HOST", "localhost")
 DEFAULT_WEAVIATE_PORT = int(os.getenv("WEAVIATE_PORT", "8080"))
 DEFAULT_COLLECTION_NAME = "DocumentChunk"
+CHUNK_RETURN_PROPERTIES = ["documentId"]  # Title/source come from SQLite, once per document
 DEFAULT_MIN_CLUSTER_SIZE = 5
 DEFAULT_MIN_SAMPLES = 5
 BATCH_SIZE = 1000  # Process chunks in batches for memory efficiency
+INITIAL_VECTOR_CAPACITY = 1024  # Initial rows in the chunk vector buffer (doubled as needed)
+FETCH_LIMIT = 10000  # Weaviate's maximum results per query
+FETCH_BATCH_SIZE = 500  # Documents per Weaviate query
+FETCH_WORKERS = 8  # Concurrent Weaviate batch queries
+GPU_MIN_DOCUMENTS = 10000  # Below this, CPU HDBSCAN beats the GPU transfer/launch overhead
+EMBEDDING_CACHE_VERSION = 2  # Bump when the cached embedding format or pooling changes
 
 
 def connect_to_weaviate(host: str = DEFAULT_WEAVIATE_HOST, port: int = DEFAULT_WEAVIATE_PORT):
@@ -59,12 +73,12 @@ def connect_to_weaviate(host: str = DEFAULT_WEAVIATE_HOST, port: int = DEFAULT_W
         sys.exit(1)
 
 
-def get_user_document_ids(db_path: str, user_id: str) -> List[str]:
+def get_user_documents(db_path: str, user_id: str) -> Dict[str, Dict]:
     """
-    Get all document IDs for a user from SQLite database.
+    Get all documents for a user, with their metadata, from SQLite database in a single query.
     
     Returns:
-        List of document IDs
+        Dictionary mapping documentId to {'title', 'source', 'tags', 'summary', 'updated_at'}
     """
     if not os.path.exists(db_path):
         print(f"✗ Database file not found: {db_path}", file=sys.stderr)
@@ -74,97 +88,237 @@ def get_user_document_ids(db_path: str, user_id: str) -> List[str]:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        query = "SELECT id FROM documents WHERE user_id = ?"
+        query = "SELECT id, title, source, tags, summary, updated_at FROM documents WHERE user_id = ?"
         cursor.execute(query, (user_id,))
         rows = cursor.fetchall()
         
-        doc_ids = [row[0] for row in rows]
+        documents = {}
+        for doc_id, title, source, tags, summary, updated_at in rows:
+            documents[doc_id] = {
+                'title': title,
+                'source': source,
+                'tags': json.loads(tags) if tags else [],
+                'summary': summary,
+                'updated_at': updated_at,
+            }
         conn.close()
         
-        print(f"✓ Found {len(doc_ids)} documents for user {user_id}")
-        return doc_ids
+        print(f"✓ Found {len(documents)} documents for user {user_id}")
+        return documents
     except Exception as e:
         print(f"✗ Error querying database: {e}", file=sys.stderr)
         sys.exit(1)
 
 
+def _fetch_batch(collection, doc_id_prop, batch_doc_ids: List[str]) -> Tuple[List, List[str]]:
+    """
+    Fetch the chunk objects of one batch of documents from Weaviate (runs on a worker thread).
+    
+    Weaviate's cursor API (after=) cannot be combined with filters, so a batch that
+    fills a whole response is split in half and each half is fetched again.
+    
+    Returns:
+        Tuple of (objects, truncated_doc_ids), where truncated_doc_ids lists documents
+        with more than FETCH_LIMIT chunks, of which only some were returned
+    """
+    # Create filter for this batch of document IDs using contains_any
+    # This is a single set-membership predicate rather than a per-document OR tree
+    query_result = collection.query.fetch_objects(
+        limit=FETCH_LIMIT,
+        filters=doc_id_prop.contains_any(batch_doc_ids),
+        include_vector=True,
+        return_properties=CHUNK_RETURN_PROPERTIES,
+    )
+    
+    if len(query_result.objects) >= FETCH_LIMIT:
+        if len(batch_doc_ids) > 1:
+            mid = len(batch_doc_ids) // 2
+            first_objects, first_truncated = _fetch_batch(collection, doc_id_prop, batch_doc_ids[:mid])
+            second_objects, second_truncated = _fetch_batch(collection, doc_id_prop, batch_doc_ids[mid:])
+            return first_objects + second_objects, first_truncated + second_truncated
+        print(
+            f"\n⚠ Document {batch_doc_ids[0]} has more than {FETCH_LIMIT} chunks; some chunks are missing",
+            file=sys.stderr,
+        )
+        return query_result.objects, list(batch_doc_ids)
+    return query_result.objects, []
+
+
+def _vector_unpacker(sample_vector) -> Callable:
+    """
+    Choose how to read vectors off Weaviate objects, based on one sample.
+    
+    Weaviate v4 returns either a bare list or a dict of named vectors, consistently
+    for a given collection, so this is decided once instead of per object.
+    """
+    if isinstance(sample_vector, dict):
+        name = "default" if "default" in sample_vector else next(iter(sample_vector))
+        return lambda vector: vector.get(name)
+    return lambda vector: vector
+
+
 def fetch_chunks_for_documents(
     client: weaviate.WeaviateClient,
     document_ids: List[str],
     collection_name: str = DEFAULT_COLLECTION_NAME,
-    batch_size: int = 50,
-) -> List[Tuple]:
+    batch_size: int = FETCH_BATCH_SIZE,
+    max_workers: int = FETCH_WORKERS,
+) -> Tuple[List[str], np.ndarray, List[str]]:
     """
     Fetch chunks for a list of documents from Weaviate.
-    Queries in batches to avoid hitting the 10,000 result limit.
+    Queries in batches to avoid hitting the 10,000 result limit, splitting any batch that
+    reaches it, with up to max_workers batches in flight at once to overlap network round trips.
+    
+    Vectors are written straight into a contiguous float32 buffer (grown by doubling)
+    rather than kept as per-chunk Python lists.
     
     Args:
         client: Weaviate client
         document_ids: List of document IDs to fetch chunks for
         collection_name: Name of the Weaviate collection
         batch_size: Number of documents to query at once
+        max_workers: Number of batches fetched concurrently
         
     Returns:
-        List of tuples: (documentId, chunkIndex, vector, title, source)
+        Tuple of (chunk_doc_ids, vectors, truncated_doc_ids) where chunk_doc_ids lists
+        the documentId of each chunk, vectors is a (num_chunks, dim) float32 array with
+        rows aligned to chunk_doc_ids, and truncated_doc_ids lists documents whose
+        chunks could only be fetched in part
     """
     if not document_ids:
-        return []
+        return [], np.empty((0, 0), dtype=np.float32), []
     
     collection = client.collections.get(collection_name)
-    chunks = []
+    chunk_doc_ids = []
+    truncated_doc_ids = []
+    vectors = None  # Allocated once the vector dimension is known
+    unpack_vector = None  # Chosen from the first object with a vector
     total_chunks = 0
     
-    # Process documents in batches
-    for i in range(0, len(document_ids), batch_size):
-        batch_doc_ids = document_ids[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(document_ids) + batch_size - 1) // batch_size
-        
-        print(f"  Fetching chunks for batch {batch_num}/{total_batches} ({len(batch_doc_ids)} documents)...", end="\r")
-        
-        # Create filter for this batch of document IDs using Filter.any_of
-        # This creates an OR condition matching any document in the batch
-        filters = Filter.any_of([
-            Filter.by_property("documentId").equal(doc_id) for doc_id in batch_doc_ids
-        ])
-        
-        # Fetch chunks for this batch
-        try:
-            query_result = collection.query.fetch_objects(
-                limit=10000,  # Max limit per query
-                filters=filters,
-                include_vector=True,
-            )
+    doc_id_prop = Filter.by_property("documentId")
+    batches = [document_ids[i:i + batch_size] for i in range(0, len(document_ids), batch_size)]
+    total_batches = len(batches)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_fetch_batch, collection, doc_id_prop, batch) for batch in batches]
+        
+        # Results are processed on this thread as batches complete, so the
+        # vector buffer is only ever written by one thread
+        for batch_num, future in enumerate(as_completed(futures), start=1):
+            print(f"  Fetched batch {batch_num}/{total_batches}...", end="\r")
+            
+            try:
+                objects, truncated = future.result()
+            except Exception as e:
+                print(f"\n✗ Error fetching chunks for batch: {e}", file=sys.stderr)
+                # Continue with next batch
+                continue
+            truncated_doc_ids.extend(truncated)
             
             # Process results
-            for item in query_result.objects:
-                # Access vector
-                vector = item.vector
-                if isinstance(vector, dict):
-                    vector = vector.get("default") or next(iter(vector.values()))
+            for item in objects:
+                if unpack_vector is None:
+                    if not item.vector:
+                        continue
+                    unpack_vector = _vector_unpacker(item.vector)
+                
+                vector = unpack_vector(item.vector)
                 if vector is None:
                     continue
                 
-                # Convert to list if needed
-                if not isinstance(vector, list):
-                    vector = list(vector)
+                if vectors is None:
+                    vectors = np.empty((INITIAL_VECTOR_CAPACITY, len(vector)), dtype=np.float32)
+                elif total_chunks == len(vectors):
+                    grown = np.empty((2 * len(vectors), vectors.shape[1]), dtype=np.float32)
+                    grown[:total_chunks] = vectors
+                    vectors = grown
+                vectors[total_chunks] = vector
                 
-                chunks.append((
-                    item.properties.get("documentId"),
-                    item.properties.get("chunkIndex"),
-                    vector,
-                    item.properties.get("title"),
-                    item.properties.get("source"),
-                ))
+                chunk_doc_ids.append(item.properties.get("documentId"))
                 total_chunks += 1
-                
-        except Exception as e:
-            print(f"\n✗ Error fetching chunks for batch: {e}", file=sys.stderr)
-            # Continue with next batch
-            continue
     
     print(f"\n✓ Fetched {total_chunks} chunks for {len(document_ids)} documents")
-    return chunks
+    if vectors is None:
+        return [], np.empty((0, 0), dtype=np.float32), truncated_doc_ids
+    return chunk_doc_ids, vectors[:total_chunks], truncated_doc_ids
+
+
+def fetch_chunk_counts(
+    client: weaviate.WeaviateClient,
+    document_ids: List[str],
+    collection_name: str = DEFAULT_COLLECTION_NAME,
+    batch_size: int = FETCH_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Count chunks per document with Weaviate aggregate queries (no objects or vectors are transferred).
+    
+    Returns:
+        Dictionary mapping documentId to its number of chunks (documents without chunks are omitted)
+    """
+    collection = client.collections.get(collection_name)
+    doc_id_prop = Filter.by_property("documentId")
+    chunk_counts = {}
+    for i in range(0, len(document_ids), batch_size):
+        batch_doc_ids = document_ids[i:i + batch_size]
+        response = collection.aggregate.over_all(
+            filters=doc_id_prop.contains_any(batch_doc_ids),
+            group_by=GroupByAggregate(prop="documentId", limit=len(batch_doc_ids)),
+            total_count=True,
+        )
+        for group in response.groups:
+            chunk_counts[group.grouped_by.value] = group.total_count
+    return chunk_counts
+
+
+def load_embedding_cache(cache_path: str) -> Dict[str, Tuple[np.ndarray, int, str]]:
+    """
+    Load cached document embeddings written by save_embedding_cache.
+    
+    Returns:
+        Dictionary mapping documentId to (embedding, chunk_count, updated_at); empty if
+        the cache is missing, unreadable or from another cache version
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if int(cache['version']) != EMBEDDING_CACHE_VERSION:
+                return {}
+            embeddings = cache['embeddings']
+            rows = zip(cache['doc_ids'].tolist(), cache['chunk_counts'].tolist(), cache['updated_at'].tolist())
+            return {
+                doc_id: (embeddings[i], count, updated_at)
+                for i, (doc_id, count, updated_at) in enumerate(rows)
+            }
+    except Exception as e:
+        print(f"Warning: Could not read embedding cache {cache_path}: {e}", file=sys.stderr)
+        return {}
+
+
+def save_embedding_cache(
+    cache_path: str,
+    doc_ids: List[str],
+    doc_matrix: np.ndarray,
+    chunk_counts: List[int],
+    updated_at: List[Optional[str]],
+):
+    """Save aggregated document embeddings so later runs can skip unchanged documents."""
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(
+            cache_path,
+            version=EMBEDDING_CACHE_VERSION,
+            doc_ids=np.array(doc_ids),
+            embeddings=doc_matrix,
+            chunk_counts=np.array(chunk_counts, dtype=np.int64),
+            updated_at=np.array([value or "" for value in updated_at]),
+        )
+        print(f"✓ Cached {len(doc_ids)} document embeddings to {cache_path}")
+    except Exception as e:
+        print(f"Warning: Could not write embedding cache {cache_path}: {e}", file=sys.stderr)
 
 
 def fetch_user_chunks(
@@ -172,29 +326,57 @@ def fetch_user_chunks(
     user_id: str,
     db_path: str,
     collection_name: str = DEFAULT_COLLECTION_NAME,
+    embedding_cache: Optional[Dict[str, Tuple[np.ndarray, int, str]]] = None,
 ):
     """
     Fetch all document chunks for a user from Weaviate with their vectors.
-    First gets document IDs from SQLite, then queries Weaviate by document ID.
+    First gets documents and their metadata from SQLite, then queries Weaviate by document ID.
     This avoids the 10,000 result limit by querying in smaller batches.
     
+    When an embedding cache is given, chunk counts are checked first and chunks are
+    only fetched for documents that are not cached or whose updated_at or chunk count changed.
+    
     Returns:
-        List of tuples: (documentId, chunkIndex, vector, title, source)
+        Tuple of (doc_metadata, chunk_doc_ids, vectors, cached_embeddings, truncated_doc_ids),
+        where doc_metadata is returned by get_user_documents, chunk_doc_ids/vectors/truncated_doc_ids
+        by fetch_chunks_for_documents, and cached_embeddings holds the still-valid
+        cache entries for documents that were not fetched
     """
     print(f"Fetching chunks for user: {user_id}...")
     
     try:
-        # Step 1: Get document IDs from SQLite
-        document_ids = get_user_document_ids(db_path, user_id)
+        # Step 1: Get documents and their metadata from SQLite
+        doc_metadata = get_user_documents(db_path, user_id)
         
-        if not document_ids:
+        if not doc_metadata:
             print(f"⚠ No documents found for user {user_id}")
-            return []
+            return {}, [], np.empty((0, 0), dtype=np.float32), {}, []
         
-        # Step 2: Fetch chunks for each document (in batches)
-        chunks = fetch_chunks_for_documents(client, document_ids, collection_name)
+        document_ids = list(doc_metadata)
+        cached_embeddings = {}
+        if embedding_cache:
+            try:
+                chunk_counts = fetch_chunk_counts(client, document_ids, collection_name)
+            except Exception as e:
+                # Without counts no cache entry can be validated, so every document is fetched
+                print(f"Warning: Could not count chunks, ignoring embedding cache: {e}", file=sys.stderr)
+            else:
+                # A cached embedding is reused while the document's updated_at and chunk count are
+                # unchanged; an edit can re-chunk a document into the same number of chunks
+                cached_embeddings = {
+                    doc_id: entry for doc_id, entry in embedding_cache.items()
+                    if doc_id in chunk_counts and chunk_counts[doc_id] == entry[1]
+                    and entry[2] == (doc_metadata[doc_id]['updated_at'] or "")
+                }
+                document_ids = [
+                    doc_id for doc_id in document_ids
+                    if doc_id in chunk_counts and doc_id not in cached_embeddings
+                ]
+                print(f"✓ Reusing {len(cached_embeddings)} cached document embeddings, fetching {len(document_ids)} documents")
         
-        return chunks
+        # Step 2: Fetch chunks for each document (in batches)
+        chunk_doc_ids, vectors, truncated_doc_ids = fetch_chunks_for_documents(client, document_ids, collection_name)
+        return doc_metadata, chunk_doc_ids, vectors, cached_embeddings, truncated_doc_ids
         
     except Exception as e:
         print(f"✗ Error fetching chunks: {e}", file=sys.stderr)
@@ -203,141 +385,203 @@ def fetch_user_chunks(
         sys.exit(1)
 
 
-def aggregate_embeddings(chunks: List[Tuple]) -> Dict[str, Dict]:
+def aggregate_embeddings(
+    chunk_doc_ids: List[str],
+    vectors: np.ndarray,
+    doc_metadata: Dict[str, Dict],
+    cached_embeddings: Optional[Dict[str, Tuple[np.ndarray, int, str]]] = None,
+) -> Tuple[Dict[str, Dict], List[str], np.ndarray]:
     """
     Aggregate chunk embeddings per document using mean pooling.
     
     Args:
-        chunks: List of (documentId, chunkIndex, vector, title, source) tuples
+        chunk_doc_ids: documentId of each chunk
+        vectors: (num_chunks, dim) float32 array aligned with chunk_doc_ids
+        doc_metadata: Per-document metadata from get_user_documents
+        cached_embeddings: Already-aggregated (embedding, chunk_count, updated_at) entries to merge in
         
     Returns:
-        Dictionary mapping documentId to {
-            'embedding': aggregated vector,
+        Tuple of (doc_embeddings, doc_ids, doc_matrix) where doc_embeddings maps documentId to {
+            'embedding': aggregated vector (float16, a row of doc_matrix),
             'title': document title,
             'source': document source,
+            'tags': document tags,
+            'summary': document summary,
+            'updated_at': document last update time,
             'chunk_count': number of chunks
-        }
+        }, and doc_matrix is a contiguous (num_docs, dim) float16 array whose rows follow doc_ids
     """
     print("Aggregating embeddings per document...")
     
-    # Group chunks by documentId
-    doc_chunks = defaultdict(list)
-    doc_metadata = {}
+    if chunk_doc_ids:
+        doc_ids, doc_vectors, counts = _mean_pool_chunks(chunk_doc_ids, vectors)
+    else:
+        doc_ids, doc_vectors, counts = [], None, []
     
-    for doc_id, chunk_idx, vector, title, source in chunks:
-        doc_chunks[doc_id].append(vector)
-        # Store metadata (use first chunk's metadata)
-        if doc_id not in doc_metadata:
-            doc_metadata[doc_id] = {
-                'title': title,
-                'source': source,
-            }
+    if cached_embeddings:
+        # Merge in cached documents, keeping doc_ids sorted as for freshly pooled ones
+        cached_ids = list(cached_embeddings)
+        cached_vectors = np.array([cached_embeddings[doc_id][0] for doc_id in cached_ids], dtype=np.float16)
+        doc_ids = doc_ids + cached_ids
+        counts = counts + [cached_embeddings[doc_id][1] for doc_id in cached_ids]
+        doc_vectors = cached_vectors if doc_vectors is None else np.vstack([doc_vectors, cached_vectors])
+        
+        order = sorted(range(len(doc_ids)), key=doc_ids.__getitem__)
+        doc_ids = [doc_ids[i] for i in order]
+        counts = [counts[i] for i in order]
+        doc_vectors = doc_vectors[order]
+    
+    if not doc_ids:
+        return {}, [], np.empty((0, 0), dtype=np.float16)
     
-    # Aggregate embeddings using mean pooling
     doc_embeddings = {}
-    for doc_id, vectors in doc_chunks.items():
-        # Convert to numpy array for efficient computation
-        vectors_array = np.array(vectors, dtype=np.float32)
-        
-        # Mean pooling
-        mean_vector = np.mean(vectors_array, axis=0)
-        
-        # L2 normalization
-        norm = np.linalg.norm(mean_vector)
-        if norm > 0:
-            mean_vector = mean_vector / norm
-        
+    for doc_id, mean_vector, count in zip(doc_ids, doc_vectors, counts):
         doc_embeddings[doc_id] = {
             'embedding': mean_vector,
-            'title': doc_metadata[doc_id]['title'],
-            'source': doc_metadata[doc_id]['source'],
-            'chunk_count': len(vectors),
+            **doc_metadata[doc_id],
+            'chunk_count': count,
         }
     
     print(f"✓ Aggregated embeddings for {len(doc_embeddings)} documents")
-    return doc_embeddings
+    return doc_embeddings, doc_ids, doc_vectors
 
 
-def get_document_metadata_from_db(db_path: str, user_id: str, doc_ids: List[str]) -> Dict[str, Dict]:
+def _mean_pool_chunks(chunk_doc_ids: List[str], vectors: np.ndarray) -> Tuple[List[str], np.ndarray, List[int]]:
     """
-    Optionally fetch document metadata from SQLite database.
+    Mean-pool and L2-normalize chunk vectors per document.
     
     Returns:
-        Dictionary mapping documentId to metadata
+        Tuple of (doc_ids, doc_vectors, chunk_counts) with doc_ids sorted and
+        doc_vectors a contiguous (num_docs, dim) float16 array
     """
-    if not os.path.exists(db_path):
-        return {}
+    # Integer-code each chunk by document, then order chunks by code so each
+    # document's rows are contiguous and sum them in a single reduceat pass
+    unique_doc_ids, doc_codes = np.unique(np.array(chunk_doc_ids), return_inverse=True)
+    counts = np.bincount(doc_codes)
+    order = np.argsort(doc_codes, kind='stable')
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    
+    # Mean pooling
+    sums = np.add.reduceat(vectors[order], offsets, axis=0)
+    sums /= counts[:, None]
+    
+    # L2 normalization
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    sums /= np.where(norms > 0, norms, 1)
+    
+    # Store at half precision; only the clustering step upcasts back to float32
+    return unique_doc_ids.tolist(), sums.astype(np.float16), counts.tolist()
+
+
+def _fit_cpu_hdbscan(
+    embeddings_matrix: np.ndarray,
+    min_cluster_size: int,
+    min_samples: int,
+) -> Tuple[np.ndarray, hdbscan.HDBSCAN]:
+    """Fit the CPU (hdbscan package) implementation."""
+    # Embeddings are L2-normalized, so Euclidean distance is monotone with cosine
+    # distance (||a - b||^2 = 2 - 2·cos) and can use the fast KD-tree Boruvka path.
+    clusterer = hdbscan.HDBSCAN(
+        min_cluster_size=min_cluster_size,
+        min_samples=min_samples,
+        metric='euclidean',
+        algorithm='boruvka_kdtree',
+        core_dist_n_jobs=-1,  # Use all available cores
+    )
+    # hdbscan requires float32/64 input, so upcast the half-precision matrix just for the fit
+    cluster_labels = clusterer.fit_predict(embeddings_matrix.astype(np.float32))
+    return cluster_labels, clusterer
+
+
+def _fit_gpu_hdbscan(
+    embeddings_matrix: np.ndarray,
+    min_cluster_size: int,
+    min_samples: int,
+) -> Optional[Tuple[np.ndarray, object]]:
+    """
+    Fit cuML's CUDA implementation of HDBSCAN.
     
+    Returns:
+        Tuple of (cluster_labels, clusterer), or None if cuML/CuPy is not available
+    """
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Create placeholders for IN clause
-        placeholders = ','.join('?' * len(doc_ids))
-        query = f"""
-            SELECT id, title, source, tags, summary
-            FROM documents
-            WHERE user_id = ? AND id IN ({placeholders})
-        """
-        
-        cursor.execute(query, [user_id] + doc_ids)
-        rows = cursor.fetchall()
-        
-        metadata = {}
-        for row in rows:
-            metadata[row['id']] = {
-                'title': row['title'],
-                'source': row['source'],
-                'tags': json.loads(row['tags']) if row['tags'] else [],
-                'summary': row['summary'],
-            }
-        
-        conn.close()
-        return metadata
-    except Exception as e:
-        print(f"Warning: Could not fetch metadata from database: {e}", file=sys.stderr)
-        return {}
+        import cupy
+        from cuml.cluster import HDBSCAN as cuHDBSCAN
+    except ImportError as e:
+        print(f"⚠ GPU clustering unavailable ({e}), falling back to CPU")
+        return None
+    
+    # Same metric as the CPU path (cuML HDBSCAN only supports Euclidean)
+    clusterer = cuHDBSCAN(
+        min_cluster_size=min_cluster_size,
+        min_samples=min_samples,
+        metric='euclidean',
+    )
+    # Transfer at half precision and upcast on the device, which halves host-to-device bytes
+    gpu_matrix = cupy.asarray(embeddings_matrix).astype(cupy.float32)
+    cluster_labels = cupy.asnumpy(clusterer.fit_predict(gpu_matrix))
+    return cluster_labels, clusterer
+
+
+def _has_condensed_tree(clusterer) -> bool:
+    """Check whether a fitted clusterer exposes a usable condensed tree."""
+    try:
+        clusterer.condensed_tree_.to_numpy()
+        return True
+    except Exception:
+        return False
 
 
 def perform_clustering(
-    doc_embeddings: Dict[str, Dict],
+    doc_matrix: np.ndarray,
     min_cluster_size: int = DEFAULT_MIN_CLUSTER_SIZE,
     min_samples: int = DEFAULT_MIN_SAMPLES,
+    use_gpu: bool = False,
+    need_tree: bool = False,
 ) -> Tuple[np.ndarray, hdbscan.HDBSCAN]:
     """
     Perform HDBSCAN clustering on document embeddings.
     
     Args:
-        doc_embeddings: Dictionary of document embeddings
+        doc_matrix: (num_docs, dim) document embedding matrix from aggregate_embeddings
         min_cluster_size: Minimum cluster size
         min_samples: Minimum samples in neighborhood
+        use_gpu: Use cuML's GPU HDBSCAN (falls back to CPU if unavailable or for small inputs)
+        need_tree: Whether the caller will extract the condensed tree from the clusterer
         
     Returns:
-        Tuple of (cluster_labels, clusterer)
+        Tuple of (cluster_labels, clusterer), with labels aligned to the rows of doc_matrix
     """
     print(f"Performing HDBSCAN clustering (min_cluster_size={min_cluster_size}, min_samples={min_samples})...")
     
-    if len(doc_embeddings) < min_cluster_size:
-        print(f"⚠ Warning: Only {len(doc_embeddings)} documents, but min_cluster_size={min_cluster_size}")
+    num_docs = len(doc_matrix)
+    if num_docs < min_cluster_size:
+        print(f"⚠ Warning: Only {num_docs} documents, but min_cluster_size={min_cluster_size}")
         print("  Clustering may not produce meaningful results.")
     
-    # Prepare data matrix
-    doc_ids = list(doc_embeddings.keys())
-    embeddings_matrix = np.array([doc_embeddings[doc_id]['embedding'] for doc_id in doc_ids])
+    # Prepare data matrix (already contiguous when it comes from aggregate_embeddings)
+    embeddings_matrix = np.ascontiguousarray(doc_matrix)
     
     # Perform clustering
-    clusterer = hdbscan.HDBSCAN(
-        min_cluster_size=min_cluster_size,
-        min_samples=min_samples,
-        metric='manhattan',
-        core_dist_n_jobs=-1,  # Use all available cores
-    )
+    gpu_result = None
+    if use_gpu:
+        if num_docs < GPU_MIN_DOCUMENTS:
+            print(f"  {num_docs} documents is below the GPU threshold ({GPU_MIN_DOCUMENTS}), using CPU")
+        else:
+            gpu_result = _fit_gpu_hdbscan(embeddings_matrix, min_cluster_size, min_samples)
     
-    cluster_labels = clusterer.fit_predict(embeddings_matrix)
+    if gpu_result is not None:
+        cluster_labels, clusterer = gpu_result
+        print("  Clustered on GPU (cuML)")
+        if need_tree and not _has_condensed_tree(clusterer):
+            # Older cuML releases don't expose condensed_tree_; refit on CPU just for the tree
+            print("  cuML clusterer has no condensed tree, refitting on CPU for tree extraction...")
+            _, clusterer = _fit_cpu_hdbscan(embeddings_matrix, min_cluster_size, min_samples)
+    else:
+        cluster_labels, clusterer = _fit_cpu_hdbscan(embeddings_matrix, min_cluster_size, min_samples)
     
     print(f"✓ Clustering complete")
-    return cluster_labels, clusterer, doc_ids
+    return cluster_labels, clusterer
 
 
 def extract_tree_structure(
@@ -363,78 +607,85 @@ def extract_tree_structure(
         tree_array = condensed_tree.to_numpy()
         num_points = len(doc_ids)
         
-        # Build complete parent-child mapping from ALL tree edges
+        # Build parent mapping from ALL tree edges
         # This includes both point-to-cluster and cluster-to-cluster relationships
-        all_children_map = defaultdict(list)  # Maps parent to all children (points and clusters)
         parent_map = {}
         lambda_map = {}
         all_cluster_nodes = set()
-        cluster_tree = []  # Only cluster-to-cluster edges (child_size > 1)
         
         # Process all tree edges to build complete hierarchy
         for row in tree_array:
             parent = int(row['parent'])
             child = int(row['child'])
             lambda_val = float(row['lambda_val'])
-            child_size = int(row['child_size'])
             
-            all_children_map[parent].append(child)
             parent_map[child] = parent
             if child not in lambda_map or lambda_val > lambda_map[child]:
                 lambda_map[child] = lambda_val
             
-            # Track cluster nodes and cluster-tree edges
+            # Track cluster nodes
             if parent >= num_points:
                 all_cluster_nodes.add(parent)
             if child >= num_points:
                 all_cluster_nodes.add(child)
-            if child_size > 1:
-                cluster_tree.append({
-                    'parent': parent,
-                    'child': child,
-                    'lambda_val': lambda_val,
-                    'child_size': child_size,
-                })
-        
-        if not cluster_tree:
-            return {'tree': [], 'edges': [], 'cluster_mapping': {}}
-        
-        # Build filtered children_map for cluster_tree (only cluster-to-cluster)
+        
+        # Cluster-to-cluster edges (child_size > 1), kept as parallel columns
+        # rather than one dict per edge
+        cluster_edges = tree_array[tree_array['child_size'] > 1]
+        edge_parents = cluster_edges['parent'].astype(np.int64)
+        edge_children = cluster_edges['child'].astype(np.int64)
+        edge_lambdas = cluster_edges['lambda_val'].astype(np.float64)
+        edge_sizes = cluster_edges['child_size'].astype(np.int64)
+        total_edges = len(cluster_edges)
+        edges = {  # Columnar, limited to the first 500 edges for JSON size
+            'parent': edge_parents[:500].tolist(),
+            'child': edge_children[:500].tolist(),
+            'lambda_val': edge_lambdas[:500].tolist(),
+            'child_size': edge_sizes[:500].tolist(),
+        }
+        
+        if not total_edges:
+            return {'tree': [], 'edges': edges, 'cluster_mapping': {}}
+        
+        # Build filtered children_map for the cluster tree (only cluster-to-cluster)
         children_map = defaultdict(list)
-        for item in cluster_tree:
-            children_map[item['parent']].append({
-                'cluster_id': item['child'],
-                'lambda_val': item['lambda_val'],
-                'size': item['child_size'],
+        for parent, child, lambda_val, size in zip(
+            edge_parents.tolist(), edge_children.tolist(), edge_lambdas.tolist(), edge_sizes.tolist()
+        ):
+            children_map[parent].append({
+                'cluster_id': child,
+                'lambda_val': lambda_val,
+                'size': size,
             })
         
-        # Recursively collect points for each cluster node
-        def collect_points(cluster_id: int) -> set:
-            """Collect all point indices that belong to this cluster node."""
-            if cluster_id < num_points:
-                return {cluster_id}  # Leaf node - it's a point itself
-            
-            # Internal node - collect points from all children
-            points = set()
-            for child_id in all_children_map.get(cluster_id, []):
-                points.update(collect_points(child_id))
-            return points
+        # Collect the points under each cluster node as a boolean mask over all points.
+        # Child cluster ids are always larger than their parent's, so visiting edges in
+        # descending parent order completes every child's mask before it is OR-ed into
+        # its parent: one bottom-up pass, no recursion.
+        points_of = {}
+        for row_idx in np.argsort(tree_array['parent'], kind='stable')[::-1]:
+            parent = int(tree_array['parent'][row_idx])
+            child = int(tree_array['child'][row_idx])
+            mask = points_of.get(parent)
+            if mask is None:
+                mask = points_of[parent] = np.zeros(num_points, dtype=bool)
+            if child < num_points:
+                mask[child] = True  # Leaf edge - the child is a point itself
+            else:
+                np.bitwise_or(mask, points_of[child], out=mask)
         
         # Map tree cluster IDs to final cluster labels via documents
         
         tree_to_final_clusters = {}
         for cluster_id in all_cluster_nodes:
-            points = collect_points(cluster_id)
-            if points:
-                # Find which final clusters these points belong to
-                final_clusters = set()
-                for point_idx in points:
-                    if point_idx < len(cluster_labels):
-                        final_cluster = int(cluster_labels[point_idx])
-                        if final_cluster != -1:  # Ignore noise
-                            final_clusters.add(final_cluster)
-                if final_clusters:  # Only store if there are final clusters
-                    tree_to_final_clusters[cluster_id] = sorted(final_clusters)
+            mask = points_of.get(cluster_id)
+            if mask is None:
+                continue
+            # Find which final clusters these points belong to, ignoring noise
+            labels = cluster_labels[mask]
+            final_clusters = np.unique(labels[labels >= 0])
+            if len(final_clusters):  # Only store if there are final clusters
+                tree_to_final_clusters[cluster_id] = final_clusters.tolist()
         
         # Find root clusters (those >= num_points that are not children of any cluster)
         root_candidates = [c for c in all_cluster_nodes 
@@ -443,37 +694,49 @@ def extract_tree_structure(
             # All clusters have cluster parents, use the one with highest lambda
             root_candidates = [max(all_cluster_nodes, key=lambda x: lambda_map.get(x, 0))]
         
-        # Build tree structure recursively with final cluster mapping
-        def build_node(cluster_id: int) -> Dict:
-            children = children_map.get(cluster_id, [])
-            child_nodes = [build_node(child['cluster_id']) for child in children]
-            
-            # Get all final clusters for this node
-            all_final_clusters = set(tree_to_final_clusters.get(cluster_id, []))
-            
-            # Get all final clusters from children
-            child_final_clusters = set()
-            for child_node in child_nodes:
-                child_final_clusters.update(child_node.get('final_clusters', []))
-            
-            # Exclusive final clusters: those in this node but not in any child
-            exclusive_final_clusters = sorted(all_final_clusters - child_final_clusters)
-            
-            return {
-                'cluster_id': cluster_id,
-                'lambda_val': lambda_map.get(cluster_id, 0.0),
-                'final_clusters': sorted(all_final_clusters),  # All final clusters (for reference)
-                'exclusive_clusters': exclusive_final_clusters,  # Only clusters not in children
-                'children': child_nodes,
-            }
+        # Build tree structure with final cluster mapping using an iterative post-order
+        # traversal: each node is built once, after all of its children, and its final
+        # cluster set is kept as a frozenset so parents union child sets without re-sorting
+        final_sets = {}
+        
+        def build_tree(root: int) -> Dict:
+            built = {}
+            stack = [(root, False)]
+            while stack:
+                cluster_id, children_built = stack.pop()
+                children = children_map.get(cluster_id, [])
+                if not children_built:
+                    stack.append((cluster_id, True))
+                    for child in reversed(children):
+                        stack.append((child['cluster_id'], False))
+                    continue
+                
+                child_ids = [child['cluster_id'] for child in children]
+                
+                # Get all final clusters for this node
+                all_final_clusters = frozenset(tree_to_final_clusters.get(cluster_id, ()))
+                final_sets[cluster_id] = all_final_clusters
+                
+                # Get all final clusters from children
+                child_final_clusters = frozenset().union(*(final_sets[c] for c in child_ids))
+                
+                built[cluster_id] = {
+                    'cluster_id': cluster_id,
+                    'lambda_val': lambda_map.get(cluster_id, 0.0),
+                    'final_clusters': sorted(all_final_clusters),  # All final clusters (for reference)
+                    # Exclusive final clusters: those in this node but not in any child
+                    'exclusive_clusters': sorted(all_final_clusters - child_final_clusters),
+                    'children': [built.pop(c) for c in child_ids],
+                }
+            return built[root]
         
         # Build tree from roots
-        tree_structure = [build_node(root) for root in root_candidates]
+        tree_structure = [build_tree(root) for root in root_candidates]
         
         return {
             'tree': tree_structure,
-            'edges': cluster_tree[:500],  # Limit for JSON size
-            'total_edges': len(cluster_tree),
+            'edges': edges,
+            'total_edges': total_edges,
             'cluster_mapping': tree_to_final_clusters,
             'note': 'Tree shows cluster hierarchy. Higher lambda_val means clusters merge later. final_clusters contains all clusters for a node. exclusive_clusters contains only clusters not in children (for parent nodes).',
         }
@@ -502,23 +765,30 @@ def format_results(
     Returns:
         Dictionary with clustering results
     """
-    # Group documents by cluster
-    clusters = defaultdict(list)
-    noise = []
-    
-    for i, doc_id in enumerate(doc_ids):
-        cluster_id = int(cluster_labels[i])
-        doc_info = {
+    # One record per document, aligned with doc_ids
+    doc_infos = []
+    for doc_id in doc_ids:
+        doc = doc_embeddings[doc_id]
+        doc_infos.append({
             'documentId': doc_id,
-            'title': doc_embeddings[doc_id]['title'],
-            'source': doc_embeddings[doc_id]['source'],
-            'chunkCount': doc_embeddings[doc_id]['chunk_count'],
-        }
-        
-        if cluster_id == -1:
-            noise.append(doc_info)
-        else:
-            clusters[cluster_id].append(doc_info)
+            'title': doc['title'],
+            'source': doc['source'],
+            'chunkCount': doc['chunk_count'],
+        })
+    
+    # Group documents by cluster: a stable sort by label keeps document order within
+    # each cluster, and searchsorted finds where each label's run starts
+    order = np.argsort(cluster_labels, kind='stable')
+    sorted_labels = cluster_labels[order]
+    unique_labels = np.unique(cluster_labels)
+    starts = np.searchsorted(sorted_labels, unique_labels)
+    ends = np.r_[starts[1:], len(order)]
+    order = order.tolist()
+    
+    clusters = {}
+    for cluster_id, start, end in zip(unique_labels.tolist(), starts.tolist(), ends.tolist()):
+        clusters[cluster_id] = [doc_infos[i] for i in order[start:end]]
+    noise = clusters.pop(-1, [])
     
     # Build result structure
     result = {
@@ -630,6 +900,17 @@ def main():
         default=None,
         help="Path to save interactive HTML tree viewer (e.g., tree.html)",
     )
+    parser.add_argument(
+        "--gpu",
+        action="store_true",
+        help=f"Cluster on the GPU with cuML when available (used for {GPU_MIN_DOCUMENTS}+ documents)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory for a per-user document embedding cache; unchanged documents skip the Weaviate fetch",
+    )
     
     args = parser.parse_args()
     
@@ -641,6 +922,11 @@ def main():
         print("Error: min_samples must be at least 1", file=sys.stderr)
         sys.exit(1)
     
+    # The tree viewer needs the tree structure; extract it once for both uses
+    want_tree = args.include_tree or bool(args.tree_viewer)
+    if args.tree_viewer and not args.include_tree:
+        print("Warning: --tree-viewer requires --include-tree. Enabling --include-tree automatically.", file=sys.stderr)
+    
     try:
         # Step 1: Connect to Weaviate
         client = connect_to_weaviate(args.weaviate_host, args.weaviate_port)
@@ -654,14 +940,37 @@ def main():
         else:
             db_path = args.db_path
         
-        chunks = fetch_user_chunks(client, args.user_id, db_path)
+        cache_path = None
+        embedding_cache = None
+        if args.cache_dir:
+            cache_path = os.path.join(args.cache_dir, f"{args.user_id}.embcache.npz")
+            embedding_cache = load_embedding_cache(cache_path)
         
-        if not chunks:
+        doc_metadata, chunk_doc_ids, vectors, cached_embeddings, truncated_doc_ids = fetch_user_chunks(
+            client, args.user_id, db_path, embedding_cache=embedding_cache,
+        )
+        
+        if not chunk_doc_ids and not cached_embeddings:
             print(f"✗ No chunks found for user: {args.user_id}", file=sys.stderr)
             sys.exit(1)
         
         # Step 3: Aggregate embeddings per document
-        doc_embeddings = aggregate_embeddings(chunks)
+        doc_embeddings, doc_ids, doc_matrix = aggregate_embeddings(
+            chunk_doc_ids, vectors, doc_metadata, cached_embeddings,
+        )
+        
+        if cache_path:
+            # Documents pooled from a partial set of chunks are recomputed next run rather than cached
+            truncated = set(truncated_doc_ids)
+            keep = [i for i, doc_id in enumerate(doc_ids) if doc_id not in truncated]
+            cached_ids = [doc_ids[i] for i in keep]
+            save_embedding_cache(
+                cache_path,
+                cached_ids,
+                doc_matrix[keep],
+                [doc_embeddings[doc_id]['chunk_count'] for doc_id in cached_ids],
+                [doc_embeddings[doc_id]['updated_at'] for doc_id in cached_ids],
+            )
         
         if len(doc_embeddings) < args.min_cluster_size:
             print(
@@ -671,18 +980,13 @@ def main():
             )
             sys.exit(1)
         
-        # Optional: Fetch additional metadata from database (already have db_path)
-        db_metadata = get_document_metadata_from_db(db_path, args.user_id, list(doc_embeddings.keys()))
-        # Merge metadata (database takes precedence)
-        for doc_id, metadata in db_metadata.items():
-            if doc_id in doc_embeddings:
-                doc_embeddings[doc_id].update(metadata)
-        
         # Step 4: Perform clustering
-        cluster_labels, clusterer, doc_ids = perform_clustering(
-            doc_embeddings,
+        cluster_labels, clusterer = perform_clustering(
+            doc_matrix,
             args.min_cluster_size,
             args.min_samples,
+            use_gpu=args.gpu,
+            need_tree=want_tree,
         )
         
         # Step 5: Format results
@@ -693,7 +997,7 @@ def main():
             clusterer,
             args.min_cluster_size,
             args.min_samples,
-            include_tree=args.include_tree,
+            include_tree=want_tree,
         )
         
         # Add user_id to result
@@ -701,64 +1005,33 @@ def main():
         
         # Step 6: Create tree viewer HTML if requested
         if args.tree_viewer:
-            if not args.include_tree:
-                print("Warning: --tree-viewer requires --include-tree. Enabling --include-tree automatically.", file=sys.stderr)
-                result['tree'] = extract_tree_structure(clusterer, doc_ids, cluster_labels)
-            
-            # Save temporary JSON file for the tree viewer script
-            import tempfile
-            temp_json = None
             try:
-                # Create temporary JSON file
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
-                    json.dump(result, f, indent=2)
-                    temp_json = f.name
-                
-                # Call the tree viewer generation script
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                viewer_script = os.path.join(script_dir, 'generate_tree_viewer.py')
-                
-                if not os.path.exists(viewer_script):
-                    print(f"Error: Tree viewer script not found: {viewer_script}", file=sys.stderr)
-                    sys.exit(1)
-                
-                import subprocess
-                result_code = subprocess.run(
-                    [sys.executable, viewer_script, temp_json, args.tree_viewer],
-                    check=False
-                )
-                
-                if result_code.returncode != 0:
-                    print(f"\n✗ Failed to create tree viewer", file=sys.stderr)
-                    sys.exit(1)
-                    
+                # Render in-process from the result we already have in memory
+                create_tree_viewer_html(result['tree'], result['clusters'], args.tree_viewer)
             except Exception as e:
                 print(f"\n✗ Failed to create tree viewer: {e}", file=sys.stderr)
                 import traceback
                 traceback.print_exc()
                 sys.exit(1)
-            finally:
-                # Clean up temporary file
-                if temp_json and os.path.exists(temp_json):
-                    try:
-                        os.unlink(temp_json)
-                    except:
-                        pass
         
         # Step 7: Output results
         print_statistics(result)
         
-        # Output JSON
-        json_output = json.dumps(result, indent=2)
+        # Output JSON (orjson emits bytes directly and serializes numpy values natively)
+        json_output = orjson.dumps(
+            result,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
         if args.output:
-            with open(args.output, 'w') as f:
+            with open(args.output, 'wb') as f:
                 f.write(json_output)
             print(f"\n✓ Results saved to: {args.output}")
         else:
             print("\n" + "=" * 60)
             print("JSON OUTPUT")
             print("=" * 60)
-            print(json_output)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(json_output + b"\n")
         
         # Close Weaviate connection
         client.close()
@@ -9,13 +9,21 @@ heterogeneous content.
 Installation:
     uv pip install -r requirements-clustering.txt
 
+Weaviate schema:
+    Chunks are fetched with documentId filters, so documentId must have indexFilterable
+    enabled (the Weaviate default); otherwise every query scans the whole collection.
+    The script checks this at startup and prints a warning if the index is missing.
+
 Usage:
-    python cluster_documents_by_chunks.py <user_id> [--min-cluster-size N] [--min-samples N] [--db-path PATH]
+    python cluster_documents_by_chunks.py <user_id> [--min-cluster-size N] [--min-samples N] [--db-path PATH] [--umap-dim N] [--precision f32|f16|i8] [--vector-cache PATH | --no-vector-cache]
 
 Examples:
     python cluster_documents_by_chunks.py user123
     python cluster_documents_by_chunks.py user123 --min-cluster-size 10 --min-samples 10
     python cluster_documents_by_chunks.py user123 --db-path backend/data/berkdoc.db
+    python cluster_documents_by_chunks.py user123 --no-vector-cache  # always refetch vectors from Weaviate
+    python cluster_documents_by_chunks.py user123 --umap-dim 0  # cluster the raw embeddings (no UMAP)
+    python cluster_documents_by_chunks.py user123 --precision f16  # half-precision distance computation
 """
 
 import argparse
@@ -24,10 +32,14 @@ import os
 import sqlite3
 import sys
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import hdbscan
 import numpy as np
+import orjson
 import weaviate
 from weaviate.classes.query import Filter
 from dotenv import load_dotenv
@@ -39,9 +51,28 @@ load_dotenv()
 DEFAULT_WEAVIATE_HOST = os.getenv("WEAVIATE_HOST", "localhost")
 DEFAULT_WEAVIATE_PORT = int(os.getenv("WEAVIATE_PORT", "8080"))
 DEFAULT_COLLECTION_NAME = "DocumentChunk"
+CHUNK_RETURN_PROPERTIES = ["documentId", "chunkIndex"]  # Title/source come from SQLite, once per document
 DEFAULT_MIN_CLUSTER_SIZE = 5
 DEFAULT_MIN_SAMPLES = 5
 DEFAULT_CHUNK_MAJORITY_THRESHOLD = 0.5  # Document assigned to cluster if >50% of chunks are in it
+DEFAULT_UMAP_DIM = 10  # Reduce embeddings to this many dimensions before clustering (0 = off)
+UMAP_MAX_NEIGHBORS = 30  # Upper bound for UMAP's n_neighbors
+CLUSTER_SELECTION_METHODS = ['eom', 'leaf']  # HDBSCAN flat cluster extraction methods
+PRECISIONS = ['f32', 'f16', 'i8']  # Embedding precision for distance computation
+DISTANCE_TILE_BYTES = 64 * 1024 * 1024  # Working-set budget per distance tile
+MAX_DISTANCE_MATRIX_BYTES = 8 * 1024 ** 3  # Largest N x N float64 matrix f16/i8 precompute (8 GiB)
+NUMBA_TILE_ROWS = 64  # Rows per cache block in the Numba distance kernel
+METRIC_CODES = {'euclidean': 0, 'manhattan': 1}  # Metric selector for the Numba kernel
+FETCH_LIMIT = 10000  # Weaviate's maximum results per query
+FETCH_BATCH_SIZE = 500  # Documents per Weaviate query
+FETCH_WORKERS = 8  # Concurrent Weaviate batch queries
+DEFAULT_VECTOR_CACHE_DIR = os.path.join("~", ".cache", "berkdoc")  # Holds one vector cache file per user and collection
+VECTOR_CACHE_VERSION = 2  # Bump when the cached vector format changes
+FAST_HDBSCAN_MAX_DIM = 30  # fast_hdbscan only uses its KD-tree path up to this dimension
+TREE_ALGORITHMS = {  # Boruvka variants of hdbscan's space-tree algorithms, by metric
+    'euclidean': 'boruvka_kdtree',
+    'manhattan': 'boruvka_balltree',
+}
 
 
 def connect_to_weaviate(host: str = DEFAULT_WEAVIATE_HOST, port: int = DEFAULT_WEAVIATE_PORT):
@@ -55,12 +86,34 @@ def connect_to_weaviate(host: str = DEFAULT_WEAVIATE_HOST, port: int = DEFAULT_W
         sys.exit(1)
 
 
-def get_user_document_ids(db_path: str, user_id: str) -> List[str]:
+def check_document_id_index(client: weaviate.WeaviateClient, collection_name: str = DEFAULT_COLLECTION_NAME):
+    """Warn if documentId has no filterable index, since every batch filter would then scan the collection."""
+    try:
+        config = client.collections.get(collection_name).config.get()
+    except Exception as e:
+        print(f"Warning: Could not read the {collection_name} schema: {e}", file=sys.stderr)
+        return
+    
+    for prop in config.properties:
+        if prop.name == "documentId":
+            if not prop.index_filterable:
+                print(
+                    f"⚠ {collection_name}.documentId is not indexFilterable, so every chunk query scans the "
+                    f"whole collection. Weaviate cannot add the index to an existing property: recreate the "
+                    f"collection with {{ name: 'documentId', dataType: 'text', indexFilterable: true }} "
+                    f"(backend/src/weaviate/weaviate.service.ts) and re-ingest.",
+                    file=sys.stderr,
+                )
+            return
+    print(f"Warning: {collection_name} has no documentId property", file=sys.stderr)
+
+
+def open_database(db_path: str) -> sqlite3.Connection:
     """
-    Get all document IDs for a user from SQLite database.
+    Open the read-only SQLite connection shared by all database reads.
     
-    Returns:
-        List of document IDs
+    The backend already runs the database in WAL mode, and this script never writes,
+    so only read-side PRAGMAs are set here.
     """
     if not os.path.exists(db_path):
         print(f"✗ Database file not found: {db_path}", file=sys.stderr)
@@ -68,129 +121,323 @@ def get_user_document_ids(db_path: str, user_id: str) -> List[str]:
     
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        query = "SELECT id FROM documents WHERE user_id = ?"
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall()
-        
-        doc_ids = [row[0] for row in rows]
-        conn.close()
-        
-        print(f"✓ Found {len(doc_ids)} documents for user {user_id}")
-        return doc_ids
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB memory-mapped reads
+        conn.execute("PRAGMA cache_size = -65536")  # 64 MB page cache
+        return conn
     except Exception as e:
-        print(f"✗ Error querying database: {e}", file=sys.stderr)
+        print(f"✗ Error opening database: {e}", file=sys.stderr)
         sys.exit(1)
 
 
+def stream_user_documents(conn: sqlite3.Connection, user_id: str, doc_metadata: Dict[str, Dict]) -> Iterator[str]:
+    """
+    Stream a user's document IDs straight from the SQLite cursor, without fetchall().
+    
+    Each document's metadata is recorded in doc_metadata as its row is read, so the
+    metadata of every yielded ID is available by the time the ID is consumed.
+    
+    Yields:
+        Document IDs
+    """
+    query = "SELECT id, title, source, tags, summary, updated_at FROM documents WHERE user_id = ?"
+    for row in conn.execute(query, (user_id,)):
+        doc_metadata[row['id']] = {
+            'title': row['title'],
+            'source': row['source'],
+            'tags': json.loads(row['tags']) if row['tags'] else [],
+            'summary': row['summary'],
+            'updated_at': row['updated_at'],
+        }
+        yield row['id']
+
+
+def _vector_unpacker(sample_vector) -> Callable:
+    """
+    Choose how to read vectors off Weaviate objects, based on one sample.
+    
+    Weaviate v4 returns either a bare list or a dict of named vectors, consistently
+    for a given collection, so this is decided once instead of per object.
+    """
+    if isinstance(sample_vector, dict):
+        name = "default" if "default" in sample_vector else next(iter(sample_vector))
+        return lambda vector: vector.get(name)
+    return lambda vector: vector
+
+
+def _fetch_one_batch(collection, doc_id_prop, batch_doc_ids: List[str]) -> List[Tuple]:
+    """
+    Fetch the chunks of one batch of documents (runs on a worker thread).
+    
+    Weaviate's cursor API (after=) cannot be combined with filters, so a batch that
+    fills a whole response is split in half and each half is fetched again.
+    
+    Returns:
+        List of tuples: (documentId, chunkIndex, vector)
+    """
+    # Create filter for this batch of document IDs using contains_any
+    # This is a single set-membership predicate rather than a per-document OR tree
+    query_result = collection.query.fetch_objects(
+        limit=FETCH_LIMIT,
+        filters=doc_id_prop.contains_any(batch_doc_ids),
+        include_vector=True,
+        return_properties=CHUNK_RETURN_PROPERTIES,
+    )
+    
+    if len(query_result.objects) >= FETCH_LIMIT:
+        if len(batch_doc_ids) > 1:
+            mid = len(batch_doc_ids) // 2
+            return (
+                _fetch_one_batch(collection, doc_id_prop, batch_doc_ids[:mid])
+                + _fetch_one_batch(collection, doc_id_prop, batch_doc_ids[mid:])
+            )
+        print(
+            f"\n⚠ Document {batch_doc_ids[0]} has more than {FETCH_LIMIT} chunks; some chunks are missing",
+            file=sys.stderr,
+        )
+    
+    chunks = []
+    append = chunks.append
+    unpack_vector = None  # Chosen from the first object with a vector
+    for item in query_result.objects:
+        if unpack_vector is None:
+            if not item.vector:
+                continue
+            unpack_vector = _vector_unpacker(item.vector)
+        
+        # Vectors are kept as returned; they are copied straight into the embeddings matrix later
+        vector = unpack_vector(item.vector)
+        if vector is None:
+            continue
+        
+        props = item.properties
+        append((props.get("documentId"), props.get("chunkIndex"), vector))
+    return chunks
+
+
 def fetch_chunks_for_documents(
     client: weaviate.WeaviateClient,
-    document_ids: List[str],
+    document_ids: Iterable[str],
     collection_name: str = DEFAULT_COLLECTION_NAME,
-    batch_size: int = 50,
+    batch_size: int = FETCH_BATCH_SIZE,
+    max_workers: int = FETCH_WORKERS,
 ) -> List[Tuple]:
     """
     Fetch chunks for a list of documents from Weaviate.
-    Queries in batches to avoid hitting the 10,000 result limit.
+    Queries in batches to avoid hitting the 10,000 result limit, splitting any batch that reaches it.
+    Batches are fetched concurrently since each query is an I/O-bound round-trip, and each
+    batch is submitted as soon as its IDs are read, so a streamed ID source overlaps the fetches.
     
     Args:
         client: Weaviate client
-        document_ids: List of document IDs to fetch chunks for
+        document_ids: Document IDs to fetch chunks for (any iterable, consumed once)
         collection_name: Name of the Weaviate collection
         batch_size: Number of documents to query at once
+        max_workers: Number of batch queries in flight at once
         
     Returns:
-        List of tuples: (documentId, chunkIndex, vector, title, source)
+        List of tuples: (documentId, chunkIndex, vector)
     """
-    if not document_ids:
-        return []
-    
     collection = client.collections.get(collection_name)
+    doc_id_prop = Filter.by_property("documentId")
     chunks = []
-    total_chunks = 0
+    doc_ids = iter(document_ids)
+    num_documents = 0
     
-    # Process documents in batches
-    for i in range(0, len(document_ids), batch_size):
-        batch_doc_ids = document_ids[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(document_ids) + batch_size - 1) // batch_size
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        while True:
+            batch = list(islice(doc_ids, batch_size))
+            if not batch:
+                break
+            num_documents += len(batch)
+            futures.append(executor.submit(_fetch_one_batch, collection, doc_id_prop, batch))
         
-        print(f"  Fetching chunks for batch {batch_num}/{total_batches} ({len(batch_doc_ids)} documents)...", end="\r")
-        
-        # Create filter for this batch of document IDs using Filter.any_of
-        # This creates an OR condition matching any document in the batch
-        filters = Filter.any_of([
-            Filter.by_property("documentId").equal(doc_id) for doc_id in batch_doc_ids
-        ])
+        if not futures:
+            return []
+        total_batches = len(futures)
         
-        # Fetch chunks for this batch
-        try:
-            query_result = collection.query.fetch_objects(
-                limit=10000,  # Max limit per query
-                filters=filters,
-                include_vector=True,
-            )
+        for batch_num, future in enumerate(as_completed(futures), start=1):
+            print(f"  Fetched batch {batch_num}/{total_batches}...", end="\r")
             
-            # Process results
-            for item in query_result.objects:
-                # Access vector
-                vector = item.vector
-                if isinstance(vector, dict):
-                    vector = vector.get("default") or next(iter(vector.values()))
-                if vector is None:
-                    continue
-                
-                # Convert to list if needed
-                if not isinstance(vector, list):
-                    vector = list(vector)
-                
-                chunks.append((
-                    item.properties.get("documentId"),
-                    item.properties.get("chunkIndex"),
-                    vector,
-                    item.properties.get("title"),
-                    item.properties.get("source"),
-                ))
-                total_chunks += 1
-                
-        except Exception as e:
-            print(f"\n✗ Error fetching chunks for batch: {e}", file=sys.stderr)
-            # Continue with next batch
-            continue
+            try:
+                chunks.extend(future.result())
+            except Exception as e:
+                print(f"\n✗ Error fetching chunks for batch: {e}", file=sys.stderr)
+                # Continue with next batch
+                continue
     
-    print(f"\n✓ Fetched {total_chunks} chunks for {len(document_ids)} documents")
+    print(f"\n✓ Fetched {len(chunks)} chunks for {num_documents} documents")
     return chunks
 
 
+def load_vector_cache(cache_path: str, collection_name: str) -> Dict[str, Tuple[str, List[Tuple]]]:
+    """
+    Load chunk vectors cached by save_vector_cache.
+    
+    Returns:
+        Dictionary mapping documentId to (updated_at, chunks), where chunks is a list of
+        (documentId, chunkIndex, vector); empty if the cache is missing,
+        unreadable, or was written for another collection or cache version
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if int(cache['version']) != VECTOR_CACHE_VERSION or str(cache['collection']) != collection_name:
+                return {}
+            
+            vectors = cache['vectors']
+            entries = {}
+            rows = zip(
+                cache['doc_ids'].tolist(),
+                cache['updated_at'].tolist(),
+                cache['chunk_indices'].tolist(),
+            )
+            for i, (doc_id, updated_at, chunk_idx) in enumerate(rows):
+                if doc_id not in entries:
+                    entries[doc_id] = (updated_at, [])
+                entries[doc_id][1].append((doc_id, chunk_idx, vectors[i]))
+            return entries
+    except Exception as e:
+        print(f"Warning: Could not read vector cache {cache_path}: {e}", file=sys.stderr)
+        return {}
+
+
+def default_vector_cache_path(user_id: str, collection_name: str) -> str:
+    """
+    Path of the vector cache for one user's documents in one collection.
+    
+    Returns:
+        Path under DEFAULT_VECTOR_CACHE_DIR, with the user ID made safe for use in a file name
+    """
+    safe_user_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in user_id)
+    return os.path.join(DEFAULT_VECTOR_CACHE_DIR, f"vectors-{safe_user_id}-{collection_name}.npz")
+
+
+def save_vector_cache(cache_path: str, collection_name: str, entries: Dict[str, Tuple[str, List[Tuple]]]):
+    """
+    Save chunk vectors as one contiguous float32 matrix plus parallel key arrays.
+    The file is written to a temporary path and then renamed, so readers never see a partial cache.
+    An existing cache is removed when there are no entries left to save.
+    """
+    rows = [(updated_at, chunk) for updated_at, doc_chunks in entries.values() for chunk in doc_chunks]
+    
+    try:
+        if not rows:
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            return
+        
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        
+        vectors = np.empty((len(rows), len(rows[0][1][2])), dtype=np.float32)
+        for i, (_, chunk) in enumerate(rows):
+            vectors[i] = chunk[2]
+        
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=VECTOR_CACHE_VERSION,
+                collection=collection_name,
+                doc_ids=np.array([chunk[0] for _, chunk in rows]),
+                updated_at=np.array([updated_at or "" for updated_at, _ in rows]),
+                chunk_indices=np.array([chunk[1] for _, chunk in rows], dtype=np.int64),
+                vectors=vectors,
+            )
+        os.replace(tmp_path, cache_path)
+        print(f"✓ Cached {len(rows)} chunk vectors to {cache_path}")
+    except Exception as e:
+        print(f"Warning: Could not write vector cache {cache_path}: {e}", file=sys.stderr)
+
+
+def _uncached_document_ids(
+    document_ids: Iterable[str],
+    doc_metadata: Dict[str, Dict],
+    vector_cache: Dict[str, Tuple[str, List[Tuple]]],
+    cached_chunks: List[Tuple],
+    missing_ids: List[str],
+) -> Iterator[str]:
+    """
+    Pass through the IDs of documents that are not cached or have changed since they were cached.
+    Chunks of unchanged documents are appended to cached_chunks, and passed-through IDs to missing_ids.
+    """
+    for doc_id in document_ids:
+        entry = vector_cache.get(doc_id)
+        if entry is not None and entry[0] == (doc_metadata[doc_id]['updated_at'] or ""):
+            cached_chunks.extend(entry[1])
+        else:
+            missing_ids.append(doc_id)
+            yield doc_id
+
+
 def fetch_user_chunks(
     client: weaviate.WeaviateClient,
     user_id: str,
-    db_path: str,
+    conn: sqlite3.Connection,
     collection_name: str = DEFAULT_COLLECTION_NAME,
+    vector_cache_path: Optional[str] = None,
 ):
     """
     Fetch all document chunks for a user from Weaviate with their vectors.
-    First gets document IDs from SQLite, then queries Weaviate by document ID.
+    First gets documents and their metadata from SQLite, then queries Weaviate by document ID.
     This avoids the 10,000 result limit by querying in smaller batches.
     
+    When a vector cache path is given, chunks of documents whose updated_at matches the
+    cache are reused and only new or changed documents are fetched from Weaviate. The
+    cache is then rewritten with only this user's current documents, so entries for
+    deleted documents are dropped.
+    
     Returns:
-        List of tuples: (documentId, chunkIndex, vector, title, source)
+        Tuple of (doc_metadata, chunks), where doc_metadata maps documentId to its
+        database metadata and chunks is a list of (documentId, chunkIndex, vector)
     """
     print(f"Fetching chunks for user: {user_id}...")
     
     try:
-        # Step 1: Get document IDs from SQLite
-        document_ids = get_user_document_ids(db_path, user_id)
+        # Step 1: Stream document IDs from SQLite, recording their metadata as rows are read
+        doc_metadata = {}
+        document_ids = stream_user_documents(conn, user_id, doc_metadata)
+        
+        vector_cache = None
+        chunks = []
+        missing_ids = []
+        if vector_cache_path:
+            # Reuse cached chunks of unchanged documents; only the rest go on to Weaviate
+            vector_cache = load_vector_cache(vector_cache_path, collection_name)
+            document_ids = _uncached_document_ids(document_ids, doc_metadata, vector_cache, chunks, missing_ids)
         
-        if not document_ids:
+        # Step 2: Fetch chunks for each document (in batches, submitted while rows are still being read)
+        fetched = fetch_chunks_for_documents(client, document_ids, collection_name)
+        chunks.extend(fetched)
+        
+        if not doc_metadata:
             print(f"⚠ No documents found for user {user_id}")
-            return []
+            return {}, []
+        print(f"✓ Found {len(doc_metadata)} documents for user {user_id}")
         
-        # Step 2: Fetch chunks for each document (in batches)
-        chunks = fetch_chunks_for_documents(client, document_ids, collection_name)
+        if vector_cache is not None:
+            print(f"✓ Reused {len(chunks) - len(fetched)} cached chunks, fetched {len(missing_ids)} documents from Weaviate")
         
-        return chunks
+        stale_ids = [] if vector_cache is None else [doc_id for doc_id in vector_cache if doc_id not in doc_metadata]
+        if missing_ids or stale_ids:
+            # Refresh the fetched documents and drop documents that no longer exist
+            for doc_id in missing_ids + stale_ids:
+                vector_cache.pop(doc_id, None)
+            for chunk in fetched:
+                doc_id = chunk[0]
+                if doc_id not in vector_cache:
+                    vector_cache[doc_id] = (doc_metadata[doc_id]['updated_at'] or "", [])
+                vector_cache[doc_id][1].append(chunk)
+            save_vector_cache(vector_cache_path, collection_name, vector_cache)
+        
+        return doc_metadata, chunks
         
     except Exception as e:
         print(f"✗ Error fetching chunks: {e}", file=sys.stderr)
@@ -199,50 +446,268 @@ def fetch_user_chunks(
         sys.exit(1)
 
 
+def _reduce_with_umap(embeddings_matrix: np.ndarray, umap_dim: int, metric: str) -> Optional[np.ndarray]:
+    """
+    Project embeddings to umap_dim dimensions so HDBSCAN's space trees stay effective.
+    
+    Returns:
+        (num_chunks, umap_dim) float32 array, or None if umap-learn is not installed
+    """
+    try:
+        import umap
+    except ImportError as e:
+        print(f"⚠ UMAP unavailable ({e}), clustering the raw embeddings")
+        return None
+    
+    reducer = umap.UMAP(
+        n_components=umap_dim,
+        metric=metric,
+        n_neighbors=min(UMAP_MAX_NEIGHBORS, len(embeddings_matrix) - 1),
+        random_state=42,
+        low_memory=True,
+    )
+    return reducer.fit_transform(embeddings_matrix).astype(np.float32, copy=False)
+
+
+def _quantize_embeddings(embeddings_matrix: np.ndarray, precision: str) -> Tuple[np.ndarray, float]:
+    """
+    Store embeddings at reduced precision.
+    
+    Returns:
+        Tuple of (quantized matrix, scale) where quantized * scale approximates the input;
+        int8 uses one global scale so distances are exact multiples of integer distances
+    """
+    if precision == 'i8':
+        max_abs = float(np.abs(embeddings_matrix).max())
+        scale = max_abs / 127 if max_abs > 0 else 1.0
+        return np.round(embeddings_matrix / scale).astype(np.int8), scale
+    return embeddings_matrix.astype(np.float16), 1.0
+
+
+@lru_cache(maxsize=None)
+def _numba_distance_kernel():
+    """
+    Compile the blocked pairwise distance kernel with Numba (once per process).
+    
+    Returns:
+        The jitted kernel, or None if numba is not installed
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+    
+    @njit(parallel=True, fastmath=True, cache=True)
+    def blocked_distances(data, scale, metric_code, tile, out):
+        n, dim = data.shape
+        n_tiles = (n + tile - 1) // tile
+        # Each thread owns a block of rows and walks the column blocks at or right of the
+        # diagonal, mirroring results so every pair is computed once while both tiles stay in cache
+        for ti in prange(n_tiles):
+            i0 = ti * tile
+            i1 = min(i0 + tile, n)
+            for j0 in range(i0, n, tile):
+                j1 = min(j0 + tile, n)
+                for i in range(i0, i1):
+                    for j in range(max(j0, i), j1):
+                        acc = 0.0
+                        if metric_code == 0:
+                            for d in range(dim):
+                                diff = np.float32(data[i, d]) - np.float32(data[j, d])
+                                acc += diff * diff
+                            value = np.sqrt(acc) * scale
+                        else:
+                            for d in range(dim):
+                                acc += abs(np.float32(data[i, d]) - np.float32(data[j, d]))
+                            value = acc * scale
+                        out[i, j] = value
+                        out[j, i] = value
+            for i in range(i0, i1):
+                out[i, i] = 0.0
+    
+    return blocked_distances
+
+
+def _precomputed_distances(embeddings_matrix: np.ndarray, metric: str, precision: str) -> np.ndarray:
+    """
+    Compute the full pairwise distance matrix tile by tile from reduced-precision embeddings.
+    
+    Each pair of tiles is upcast to float32 only while it is being processed, so the
+    embedding reads stream at half (f16) or a quarter (i8) of the float32 bandwidth.
+    Uses the parallel Numba kernel when numba is installed, NumPy tiles otherwise.
+    
+    Returns:
+        (num_chunks, num_chunks) float64 distance matrix (the dtype hdbscan requires)
+    """
+    data, scale = _quantize_embeddings(embeddings_matrix, precision)
+    n, dim = data.shape
+    
+    kernel = _numba_distance_kernel()
+    if kernel is not None:
+        # Numba has no CPU float16 arithmetic
+        if data.dtype == np.float16:
+            data = data.astype(np.float32)
+        distances = np.empty((n, n), dtype=np.float64)
+        kernel(data, scale, METRIC_CODES[metric], NUMBA_TILE_ROWS, distances)
+        return distances
+    
+    # Manhattan materializes a (tile, tile, dim) difference block, so size tiles to fit the budget
+    tile = max(1, min(n, int((DISTANCE_TILE_BYTES / (4 * dim)) ** 0.5)))
+    
+    distances = np.empty((n, n), dtype=np.float64)
+    for i in range(0, n, tile):
+        a = data[i:i + tile].astype(np.float32)
+        for j in range(0, n, tile):
+            b = data[j:j + tile].astype(np.float32)
+            if metric == 'manhattan':
+                block = np.abs(a[:, None, :] - b[None, :, :]).sum(axis=2) * scale
+            else:
+                sq = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+                block = np.sqrt(np.maximum(sq, 0.0)) * scale
+            distances[i:i + tile, j:j + tile] = block
+    
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+def _fit_fast_hdbscan(
+    embeddings_matrix: np.ndarray,
+    min_cluster_size: int,
+    min_samples: int,
+    cluster_selection_method: str,
+) -> Optional[Tuple[np.ndarray, object]]:
+    """
+    Fit the multi-core fast_hdbscan implementation (Euclidean only).
+    
+    Returns:
+        Tuple of (cluster_labels, clusterer), or None if fast_hdbscan is not installed
+    """
+    try:
+        from fast_hdbscan import HDBSCAN as FastHDBSCAN
+    except ImportError:
+        return None
+    
+    clusterer = FastHDBSCAN(
+        min_cluster_size=min_cluster_size,
+        min_samples=min_samples,
+        cluster_selection_method=cluster_selection_method,
+    )
+    cluster_labels = clusterer.fit_predict(embeddings_matrix)
+    return cluster_labels, clusterer
+
+
+def _fit_hdbscan(
+    embeddings_matrix: np.ndarray,
+    min_cluster_size: int,
+    min_samples: int,
+    metric: str,
+    cluster_selection_method: str,
+) -> Tuple[np.ndarray, hdbscan.HDBSCAN]:
+    """Fit the hdbscan package implementation, using a Boruvka space-tree algorithm where the metric allows."""
+    clusterer = hdbscan.HDBSCAN(
+        min_cluster_size=min_cluster_size,
+        min_samples=min_samples,
+        metric=metric,
+        algorithm=TREE_ALGORITHMS.get(metric, 'best'),
+        cluster_selection_method=cluster_selection_method,
+        approx_min_span_tree=True,
+        # Only labels are used: skip retaining the MST and building prediction data
+        gen_min_span_tree=False,
+        prediction_data=False,
+        core_dist_n_jobs=-1,  # Use all available cores
+    )
+    cluster_labels = clusterer.fit_predict(embeddings_matrix)
+    return cluster_labels, clusterer
+
+
 def perform_chunk_clustering(
     chunks: List[Tuple],
     min_cluster_size: int = DEFAULT_MIN_CLUSTER_SIZE,
     min_samples: int = DEFAULT_MIN_SAMPLES,
     metric: str = 'manhattan',
-) -> Tuple[np.ndarray, hdbscan.HDBSCAN, List[Tuple]]:
+    umap_dim: int = 0,
+    precision: str = 'f32',
+    cluster_selection_method: str = 'eom',
+) -> Tuple[np.ndarray, object, List[Tuple]]:
     """
     Perform HDBSCAN clustering directly on chunk embeddings.
     
     Args:
-        chunks: List of (documentId, chunkIndex, vector, title, source) tuples
+        chunks: List of (documentId, chunkIndex, vector) tuples
         min_cluster_size: Minimum cluster size
         min_samples: Minimum samples in neighborhood
-        metric: Distance metric for clustering
+        metric: Distance metric for clustering (used by UMAP when umap_dim > 0);
+            cosine is run as Euclidean on L2-normalized embeddings
+        umap_dim: Reduce embeddings to this many dimensions with UMAP first (0 = off);
+            the reduced embeddings are clustered with the Euclidean metric
+        precision: 'f32' clusters the embeddings directly; 'f16'/'i8' precompute the
+            pairwise distance matrix from half-precision/int8 embeddings, falling back to
+            'f32' when that matrix would exceed MAX_DISTANCE_MATRIX_BYTES
+        cluster_selection_method: How flat clusters are extracted from the tree ('eom' or 'leaf')
         
     Returns:
         Tuple of (cluster_labels, clusterer, chunks_with_metadata)
     """
     print(f"Performing HDBSCAN clustering on {len(chunks)} chunks...")
-    print(f"  Parameters: min_cluster_size={min_cluster_size}, min_samples={min_samples}, metric={metric}")
+    print(
+        f"  Parameters: min_cluster_size={min_cluster_size}, min_samples={min_samples}, metric={metric}, "
+        f"cluster_selection_method={cluster_selection_method}"
+    )
     
     if len(chunks) < min_cluster_size:
         print(f"⚠ Warning: Only {len(chunks)} chunks, but min_cluster_size={min_cluster_size}")
         print("  Clustering may not produce meaningful results.")
     
-    # Prepare data matrix - extract vectors from chunks
-    vectors = []
+    # Prepare data matrix - preallocate it and copy each vector straight into its row
+    # (avoids an intermediate list of vectors and a second full copy)
+    embeddings_matrix = np.empty((len(chunks), len(chunks[0][2])), dtype=np.float32)
     chunks_with_metadata = []
     
-    for doc_id, chunk_idx, vector, title, source in chunks:
-        vectors.append(vector)
-        chunks_with_metadata.append((doc_id, chunk_idx, title, source))
+    for i, (doc_id, chunk_idx, vector) in enumerate(chunks):
+        embeddings_matrix[i] = vector
+        chunks_with_metadata.append((doc_id, chunk_idx))
     
-    embeddings_matrix = np.array(vectors, dtype=np.float32)
+    if metric == 'cosine':
+        # On L2-normalized vectors ||a - b||^2 = 2 - 2·cos(a, b), so Euclidean distance orders
+        # pairs exactly like cosine distance while allowing the tree-accelerated algorithms
+        norms = np.linalg.norm(embeddings_matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings_matrix /= norms
+        metric = 'euclidean'
     
-    # Perform clustering on chunks
-    clusterer = hdbscan.HDBSCAN(
-        min_cluster_size=min_cluster_size,
-        min_samples=min_samples,
-        metric=metric,
-        core_dist_n_jobs=-1,  # Use all available cores
-    )
+    if umap_dim and len(chunks) > umap_dim + 1:
+        print(f"  Reducing embeddings to {umap_dim} dimensions with UMAP...")
+        reduced = _reduce_with_umap(embeddings_matrix, umap_dim, metric)
+        if reduced is not None:
+            # Drop the full-dimensional matrix so it can be freed before clustering
+            embeddings_matrix = reduced
+            metric = 'euclidean'
     
-    cluster_labels = clusterer.fit_predict(embeddings_matrix)
+    if precision != 'f32':
+        # hdbscan needs the whole precomputed matrix in float64, which grows with N^2
+        matrix_bytes = len(chunks) ** 2 * np.dtype(np.float64).itemsize
+        if matrix_bytes > MAX_DISTANCE_MATRIX_BYTES:
+            print(
+                f"⚠ A {precision} distance matrix for {len(chunks)} chunks would need "
+                f"{matrix_bytes / 1024 ** 3:.1f} GiB (limit {MAX_DISTANCE_MATRIX_BYTES / 1024 ** 3:.0f} GiB); "
+                f"clustering at f32 without precomputed distances instead",
+                file=sys.stderr,
+            )
+            precision = 'f32'
+    
+    # Perform clustering on chunks, preferring fast_hdbscan for low-dimensional Euclidean data
+    result = None
+    if precision != 'f32':
+        print(f"  Precomputing {precision} pairwise distances...")
+        distances = _precomputed_distances(embeddings_matrix, metric, precision)
+        result = _fit_hdbscan(distances, min_cluster_size, min_samples, 'precomputed', cluster_selection_method)
+    elif metric == 'euclidean' and embeddings_matrix.shape[1] <= FAST_HDBSCAN_MAX_DIM:
+        result = _fit_fast_hdbscan(embeddings_matrix, min_cluster_size, min_samples, cluster_selection_method)
+        if result is not None:
+            print("  Using fast_hdbscan")
+    if result is None:
+        result = _fit_hdbscan(embeddings_matrix, min_cluster_size, min_samples, metric, cluster_selection_method)
+    cluster_labels, clusterer = result
     
     print(f"✓ Chunk clustering complete")
     print(f"  Found {len(set(cluster_labels)) - (1 if -1 in cluster_labels else 0)} clusters")
@@ -254,6 +719,7 @@ def perform_chunk_clustering(
 def map_chunk_clusters_to_documents(
     chunks_with_metadata: List[Tuple],
     chunk_cluster_labels: np.ndarray,
+    doc_metadata: Dict[str, Dict],
     majority_threshold: float = DEFAULT_CHUNK_MAJORITY_THRESHOLD,
 ) -> Dict[str, Dict]:
     """
@@ -261,15 +727,15 @@ def map_chunk_clusters_to_documents(
     A document is assigned to a cluster if a majority (threshold) of its chunks belong to that cluster.
     
     Args:
-        chunks_with_metadata: List of (documentId, chunkIndex, title, source) tuples
+        chunks_with_metadata: List of (documentId, chunkIndex) tuples
         chunk_cluster_labels: Cluster labels for each chunk
+        doc_metadata: Per-document metadata (title, source, ...) from stream_user_documents
         majority_threshold: Minimum fraction of chunks that must be in a cluster for document assignment
         
     Returns:
         Dictionary mapping documentId to {
             'cluster_id': assigned cluster ID (or -1 for noise/multi-cluster),
-            'title': document title,
-            'source': document source,
+            **doc_metadata[documentId] (title, source, tags, summary, ...),
             'chunk_count': total chunks,
             'chunk_cluster_distribution': dict of cluster_id -> count,
             'primary_cluster': cluster with most chunks,
@@ -278,110 +744,69 @@ def map_chunk_clusters_to_documents(
     """
     print("Mapping chunk clusters to documents...")
     
-    # Group chunks by document
-    doc_chunks = defaultdict(list)
-    doc_metadata = {}
-    
-    for i, (doc_id, chunk_idx, title, source) in enumerate(chunks_with_metadata):
-        cluster_id = int(chunk_cluster_labels[i])
-        doc_chunks[doc_id].append(cluster_id)
-        # Store metadata (use first chunk's metadata)
-        if doc_id not in doc_metadata:
-            doc_metadata[doc_id] = {
-                'title': title,
-                'source': source,
-            }
-    
-    # Assign documents to clusters based on chunk distribution
-    doc_clusters = {}
+    labels = np.asarray(chunk_cluster_labels)
     
-    for doc_id, chunk_clusters in doc_chunks.items():
-        total_chunks = len(chunk_clusters)
-        
-        # Count chunks per cluster
-        cluster_counts = defaultdict(int)
-        for cluster_id in chunk_clusters:
-            cluster_counts[cluster_id] += 1
-        
-        # Find primary cluster (cluster with most chunks)
-        if cluster_counts:
-            primary_cluster = max(cluster_counts.items(), key=lambda x: x[1])
-            primary_cluster_id, primary_count = primary_cluster
-            primary_ratio = primary_count / total_chunks
-        else:
-            primary_cluster_id = -1
-            primary_ratio = 0.0
-        
-        # Assign document to cluster if majority threshold is met
-        assigned_cluster = -1  # Default to noise/multi-cluster
-        if primary_ratio >= majority_threshold:
-            assigned_cluster = primary_cluster_id
-        
+    # Factorize document IDs to integers
+    unique_doc_ids, doc_idx = np.unique(
+        np.array([chunk[0] for chunk in chunks_with_metadata]),
+        return_inverse=True,
+    )
+    num_docs = len(unique_doc_ids)
+    num_clusters = int(labels.max()) + 1 if len(labels) else 0
+    
+    # Count chunks per (document, cluster) pair that actually occurs, as sorted sparse keys
+    # rather than a dense document x cluster matrix. Noise (-1) goes in the last column so
+    # a tie between noise and a real cluster resolves to the cluster.
+    columns = np.where(labels >= 0, labels, num_clusters)
+    keys, pair_counts = np.unique(doc_idx * (num_clusters + 1) + columns, return_counts=True)
+    pair_columns = keys % (num_clusters + 1)
+    pair_labels = np.where(pair_columns == num_clusters, -1, pair_columns)
+    
+    # Keys sort by document, then column, so each document's pairs form one run
+    starts = np.searchsorted(keys // (num_clusters + 1), np.arange(num_docs))
+    ends = np.r_[starts[1:], len(keys)]
+    totals = np.add.reduceat(pair_counts, starts)
+    max_counts = np.maximum.reduceat(pair_counts, starts)
+    
+    # The primary cluster is the first pair of each run reaching its maximum: the lowest
+    # cluster id among tied clusters, and noise only if no cluster ties with it
+    at_max = np.flatnonzero(pair_counts == np.repeat(max_counts, ends - starts))
+    primary_clusters = pair_labels[at_max[np.searchsorted(at_max, starts)]]
+    primary_ratios = max_counts / totals
+    
+    # Assign documents to clusters if majority threshold is met (-1 = noise/multi-cluster)
+    assigned_clusters = np.where(primary_ratios >= majority_threshold, primary_clusters, -1)
+    
+    pair_labels = pair_labels.tolist()
+    pair_counts = pair_counts.tolist()
+    doc_clusters = {}
+    for i, (doc_id, start, end) in enumerate(zip(unique_doc_ids.tolist(), starts.tolist(), ends.tolist())):
         doc_clusters[doc_id] = {
-            'cluster_id': assigned_cluster,
-            'title': doc_metadata[doc_id]['title'],
-            'source': doc_metadata[doc_id]['source'],
-            'chunk_count': total_chunks,
-            'chunk_cluster_distribution': dict(cluster_counts),
-            'primary_cluster': primary_cluster_id,
-            'primary_cluster_ratio': primary_ratio,
+            'cluster_id': assigned_clusters[i],
+            **doc_metadata[doc_id],
+            'chunk_count': totals[i],
+            'chunk_cluster_distribution': dict(zip(pair_labels[start:end], pair_counts[start:end])),
+            'primary_cluster': primary_clusters[i],
+            'primary_cluster_ratio': primary_ratios[i],
         }
     
     print(f"✓ Mapped clusters to {len(doc_clusters)} documents")
     return doc_clusters
 
 
-def get_document_metadata_from_db(db_path: str, user_id: str, doc_ids: List[str]) -> Dict[str, Dict]:
-    """
-    Optionally fetch document metadata from SQLite database.
-    
-    Returns:
-        Dictionary mapping documentId to metadata
-    """
-    if not os.path.exists(db_path):
-        return {}
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Create placeholders for IN clause
-        placeholders = ','.join('?' * len(doc_ids))
-        query = f"""
-            SELECT id, title, source, tags, summary
-            FROM documents
-            WHERE user_id = ? AND id IN ({placeholders})
-        """
-        
-        cursor.execute(query, [user_id] + doc_ids)
-        rows = cursor.fetchall()
-        
-        metadata = {}
-        for row in rows:
-            metadata[row['id']] = {
-                'title': row['title'],
-                'source': row['source'],
-                'tags': json.loads(row['tags']) if row['tags'] else [],
-                'summary': row['summary'],
-            }
-        
-        conn.close()
-        return metadata
-    except Exception as e:
-        print(f"Warning: Could not fetch metadata from database: {e}", file=sys.stderr)
-        return {}
-
-
 def format_results(
     doc_clusters: Dict[str, Dict],
     min_cluster_size: int,
     min_samples: int,
     majority_threshold: float,
+    legacy_output: bool = False,
 ) -> Dict:
     """
     Format clustering results into JSON structure.
     
+    Per-document fields are only emitted once, under 'documents'; legacy_output also
+    adds the 'documentIds' (and, for clusters, 'titles') arrays derived from them.
+    
     Returns:
         Dictionary with clustering results
     """
@@ -419,12 +844,10 @@ def format_results(
         'multiClusterCount': len(multi_cluster),
         'clusters': {},
         'noise': {
-            'documentIds': [doc['documentId'] for doc in noise],
             'documents': noise,
             'count': len(noise),
         },
         'multiCluster': {
-            'documentIds': [doc['documentId'] for doc in multi_cluster],
             'documents': multi_cluster,
             'count': len(multi_cluster),
             'description': 'Documents with chunks split across multiple clusters (did not meet majority threshold)',
@@ -439,13 +862,17 @@ def format_results(
     # Add cluster details
     for cluster_id, docs in clusters.items():
         result['clusters'][str(cluster_id)] = {
-            'documentIds': [doc['documentId'] for doc in docs],
-            'titles': [doc['title'] for doc in docs],
-            'sources': list(set([doc['source'] for doc in docs])),
+            'sources': sorted({doc['source'] for doc in docs}),
             'documents': docs,
             'size': len(docs),
         }
     
+    if legacy_output:
+        for group in (result['noise'], result['multiCluster'], *result['clusters'].values()):
+            group['documentIds'] = [doc['documentId'] for doc in group['documents']]
+        for cluster in result['clusters'].values():
+            cluster['titles'] = [doc['title'] for doc in cluster['documents']]
+    
     return result
 
 
@@ -505,6 +932,26 @@ def main():
         choices=['euclidean', 'manhattan', 'cosine'],
         help="Distance metric for clustering (default: manhattan)",
     )
+    parser.add_argument(
+        "--cluster-selection-method",
+        type=str,
+        default='eom',
+        choices=CLUSTER_SELECTION_METHODS,
+        help="HDBSCAN cluster extraction: 'eom' (excess of mass) or 'leaf' for finer clusters (default: eom)",
+    )
+    parser.add_argument(
+        "--umap-dim",
+        type=int,
+        default=DEFAULT_UMAP_DIM,
+        help=f"Reduce embeddings with UMAP to this many dimensions before clustering, 0 to disable (default: {DEFAULT_UMAP_DIM})",
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default='f32',
+        choices=PRECISIONS,
+        help="Embedding precision for distances; f16/i8 precompute an N x N distance matrix, falling back to f32 above 8 GiB (default: f32)",
+    )
     parser.add_argument(
         "--db-path",
         type=str,
@@ -529,6 +976,25 @@ def main():
         default=None,
         help="Output JSON file path (default: print to stdout)",
     )
+    parser.add_argument(
+        "--legacy-output",
+        action="store_true",
+        help="Also emit the documentIds/titles arrays duplicated from each group's documents",
+    )
+    parser.add_argument(
+        "--vector-cache",
+        type=str,
+        default=None,
+        help=(
+            "Chunk vector cache file, invalidated per document on updated_at "
+            f"(default: {DEFAULT_VECTOR_CACHE_DIR}/vectors-<user>-<collection>.npz)"
+        ),
+    )
+    parser.add_argument(
+        "--no-vector-cache",
+        action="store_true",
+        help="Always fetch chunk vectors from Weaviate without reading or writing the cache",
+    )
     
     args = parser.parse_args()
     
@@ -542,10 +1008,14 @@ def main():
     if not 0 < args.majority_threshold <= 1:
         print("Error: majority_threshold must be between 0 and 1", file=sys.stderr)
         sys.exit(1)
+    if args.umap_dim < 0:
+        print("Error: umap_dim must be at least 0", file=sys.stderr)
+        sys.exit(1)
     
     try:
         # Step 1: Connect to Weaviate
         client = connect_to_weaviate(args.weaviate_host, args.weaviate_port)
+        check_document_id_index(client)
         
         # Step 2: Fetch user chunks (requires db_path to get document IDs first)
         # Resolve db_path relative to script directory if needed
@@ -556,7 +1026,16 @@ def main():
         else:
             db_path = args.db_path
         
-        chunks = fetch_user_chunks(client, args.user_id, db_path)
+        vector_cache_path = None
+        if not args.no_vector_cache:
+            vector_cache_path = os.path.expanduser(
+                args.vector_cache or default_vector_cache_path(args.user_id, DEFAULT_COLLECTION_NAME)
+            )
+        conn = open_database(db_path)
+        try:
+            doc_metadata, chunks = fetch_user_chunks(client, args.user_id, conn, vector_cache_path=vector_cache_path)
+        finally:
+            conn.close()
         
         if not chunks:
             print(f"✗ No chunks found for user: {args.user_id}", file=sys.stderr)
@@ -568,12 +1047,16 @@ def main():
             args.min_cluster_size,
             args.min_samples,
             args.metric,
+            args.umap_dim,
+            args.precision,
+            args.cluster_selection_method,
         )
         
         # Step 4: Map chunk clusters back to documents
         doc_clusters = map_chunk_clusters_to_documents(
             chunks_with_metadata,
             chunk_cluster_labels,
+            doc_metadata,
             args.majority_threshold,
         )
         
@@ -584,19 +1067,13 @@ def main():
                 file=sys.stderr,
             )
         
-        # Optional: Fetch additional metadata from database
-        db_metadata = get_document_metadata_from_db(db_path, args.user_id, list(doc_clusters.keys()))
-        # Merge metadata (database takes precedence)
-        for doc_id, metadata in db_metadata.items():
-            if doc_id in doc_clusters:
-                doc_clusters[doc_id].update(metadata)
-        
         # Step 5: Format results
         result = format_results(
             doc_clusters,
             args.min_cluster_size,
             args.min_samples,
             args.majority_threshold,
+            args.legacy_output,
         )
         
         # Add user_id to result
@@ -605,17 +1082,21 @@ def main():
         # Step 6: Output results
         print_statistics(result)
         
-        # Output JSON
-        json_output = json.dumps(result, indent=2)
+        # Output JSON (orjson emits bytes directly and serializes numpy values natively)
+        json_output = orjson.dumps(
+            result,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
         if args.output:
-            with open(args.output, 'w') as f:
+            with open(args.output, 'wb') as f:
                 f.write(json_output)
             print(f"\n✓ Results saved to: {args.output}")
         else:
             print("\n" + "=" * 60)
             print("JSON OUTPUT")
             print("=" * 60)
-            print(json_output)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(json_output + b"\n")
         
         # Close Weaviate connection
         client.close()
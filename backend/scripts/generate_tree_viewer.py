@@ -8,84 +8,102 @@ and generates an interactive HTML viewer for exploring the cluster hierarchy.
 Usage:
     python generate_tree_viewer.py <input_json> <output_html>
 
+The page loads cluster details on demand from a <output_html>.clusters/
+directory written next to it; keep the two together when moving the viewer.
+
+An output path ending in .gz (or --gzip) writes the page gzip-compressed, for
+serving from a web server with Content-Encoding: gzip.
+
 Example:
     python generate_tree_viewer.py results.json tree.html
 """
 
 import argparse
+import gzip
+import html
 import json
 import os
 import sys
+from collections import defaultdict
+from typing import Dict, Iterator, List, Set, Tuple
+from urllib.parse import quote
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: the stdlib json encoder is used instead
 
-def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: str):
-    """
-    Create an HTML file with an interactive tree viewer for exploring the cluster hierarchy.
-    
-    Args:
-        tree_data: Tree structure from extract_tree_structure
-        clusters_data: Cluster information from format_results
-        output_path: Path to save the HTML file
-    """
-    # Resolve output path to absolute path
-    if not os.path.isabs(output_path):
-        output_path = os.path.abspath(output_path)
-    
-    # Create output directory if it doesn't exist
-    output_dir = os.path.dirname(output_path)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir, exist_ok=True)
-    
-    # Serialize data to JSON (properly escaped for JavaScript)
-    tree_json = json.dumps(tree_data, indent=2)
-    clusters_json = json.dumps(clusters_data, indent=2)
-    
-    # Create HTML content
-    html_content = f"""<!DOCTYPE html>
+
+OUTPUT_BUFFER_SIZE = 1024 * 1024  # Write buffer for the generated HTML (1 MiB)
+CLUSTER_SHARDS = 64  # Cluster detail files the page loads on demand, by cluster id modulo
+DOCUMENT_PREVIEW_LIMIT = 20  # Documents per cluster in the shards; the rest load on "Show All"
+JSON_WRITE_CHUNK = 1024  # List items serialized per write when streaming the embedded tree data
+GZIP_COMPRESS_LEVEL = 6  # zlib level for .gz output; higher levels gain little on HTML/JSON
+
+# Markup of one tree node up to its children, filled in per node with str.format_map;
+# the page appends the children and the closing </div>
+_NODE_HTML = (
+    '<div class="tree-node{node_class}" data-node="{index}">'
+    '<div class="tree-node-header {header_class}">'
+    '<span class="toggle"></span>'
+    '<div class="node-info">'
+    '<span class="node-label">Tree Node {label}</span>'
+    '<div class="node-meta">'
+    '<span class="meta-item"><span class="meta-badge">λ: {lambda_str}</span></span>'
+    '{doc_count}'
+    '</div>'
+    '</div>'
+    '</div>'
+    '<div class="node-details"></div>'
+)
+
+# Static parts of the viewer page, encoded once at import; the serialized tree and cluster
+# data are written between them
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Cluster Tree Viewer</title>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
             background: #f5f5f5;
             padding: 20px;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1400px;
             margin: 0 auto;
             background: white;
             border-radius: 8px;
             box-shadow: 0 2px 8px rgba(0,0,0,0.1);
             overflow: hidden;
-        }}
+        }
         
-        .header {{
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 20px 30px;
-        }}
+        }
         
-        .header h1 {{
+        .header h1 {
             font-size: 24px;
             margin-bottom: 8px;
-        }}
+        }
         
-        .header p {{
+        .header p {
             opacity: 0.9;
             font-size: 14px;
-        }}
+        }
         
-        .controls {{
+        .controls {
             padding: 20px 30px;
             background: #fafafa;
             border-bottom: 1px solid #e0e0e0;
@@ -93,32 +111,35 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             gap: 15px;
             align-items: center;
             flex-wrap: wrap;
-        }}
+        }
         
-        .search-box {{
+        .search-box {
             flex: 1;
             min-width: 200px;
-        }}
+        }
         
-        .search-box input {{
+        .search-box input {
             width: 100%;
             padding: 8px 12px;
             border: 1px solid #ddd;
             border-radius: 4px;
             font-size: 14px;
-        }}
+        }
         
-        .tree-container {{
+        .tree-container {
             padding: 30px;
             max-height: calc(100vh - 250px);
             overflow-y: auto;
-        }}
+        }
         
-        .tree-node {{
+        .tree-node {
             margin: 8px 0;
-        }}
+            /* Let the browser skip layout and paint of nodes scrolled out of view */
+            content-visibility: auto;
+            contain-intrinsic-size: auto 44px;
+        }
         
-        .tree-node-header {{
+        .tree-node-header {
             display: flex;
             align-items: center;
             padding: 10px 15px;
@@ -128,19 +149,19 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             cursor: pointer;
             transition: all 0.2s;
             user-select: none;
-        }}
+        }
         
-        .tree-node-header:hover {{
+        .tree-node-header:hover {
             background: #e9ecef;
             border-color: #667eea;
-        }}
+        }
         
-        .tree-node-header.expanded {{
+        .tree-node-header.expanded {
             background: #e7f3ff;
             border-color: #667eea;
-        }}
+        }
         
-        .toggle {{
+        .toggle {
             width: 20px;
             height: 20px;
             margin-right: 10px;
@@ -153,67 +174,67 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             font-size: 12px;
             font-weight: bold;
             flex-shrink: 0;
-        }}
+        }
         
-        .tree-node-header.collapsed .toggle::before {{
+        .tree-node-header.collapsed .toggle::before {
             content: '+';
-        }}
+        }
         
-        .tree-node-header.expanded .toggle::before {{
+        .tree-node-header.expanded .toggle::before {
             content: '−';
-        }}
+        }
         
-        .tree-node-header.leaf .toggle {{
+        .tree-node-header.leaf .toggle {
             background: #ccc;
             visibility: hidden;
-        }}
+        }
         
-        .node-info {{
+        .node-info {
             flex: 1;
             display: flex;
             align-items: center;
             gap: 15px;
             flex-wrap: wrap;
-        }}
+        }
         
-        .node-label {{
+        .node-label {
             font-weight: 600;
             color: #333;
-        }}
+        }
         
-        .node-meta {{
+        .node-meta {
             display: flex;
             gap: 15px;
             font-size: 13px;
             color: #666;
-        }}
+        }
         
-        .meta-item {{
+        .meta-item {
             display: flex;
             align-items: center;
             gap: 4px;
-        }}
+        }
         
-        .meta-badge {{
+        .meta-badge {
             background: #667eea;
             color: white;
             padding: 2px 8px;
             border-radius: 12px;
             font-size: 11px;
             font-weight: 600;
-        }}
+        }
         
-        .tree-node-children {{
+        .tree-node-children {
             margin-left: 30px;
             margin-top: 5px;
             display: none;
-        }}
+        }
         
-        .tree-node.expanded .tree-node-children {{
+        .tree-node.expanded .tree-node-children {
             display: block;
-        }}
+        }
         
-        .doc-preview {{
+        .doc-preview {
             margin-top: 8px;
             padding: 8px 12px;
             background: #fff3cd;
@@ -223,13 +244,13 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             max-height: 100px;
             overflow-y: auto;
             display: none;
-        }}
+        }
         
-        .tree-node.expanded .doc-preview {{
+        .tree-node.expanded .doc-preview {
             display: block;
-        }}
+        }
         
-        .cluster-details {{
+        .cluster-details {
             margin-top: 10px;
             padding: 15px;
             background: #f8f9fa;
@@ -237,76 +258,76 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             border-left: 3px solid #667eea;
             font-size: 13px;
             display: none;
-        }}
+        }
         
-        .tree-node.expanded .cluster-details {{
+        .tree-node.expanded .cluster-details {
             display: block;
-        }}
+        }
         
-        .cluster-details h4 {{
+        .cluster-details h4 {
             margin-bottom: 10px;
             color: #333;
-        }}
+        }
         
-        .doc-list {{
+        .doc-list {
             list-style: none;
             margin-top: 8px;
-        }}
+        }
         
-        .doc-item {{
+        .doc-item {
             padding: 8px 12px;
             margin: 4px 0;
             background: white;
             border-radius: 4px;
             border: 1px solid #e0e0e0;
             transition: background 0.2s;
-        }}
+        }
         
-        .doc-item:hover {{
+        .doc-item:hover {
             background: #f0f0f0;
             border-color: #667eea;
-        }}
+        }
         
-        .doc-title {{
+        .doc-title {
             font-weight: 500;
             color: #333;
             font-size: 14px;
             margin-bottom: 4px;
-        }}
+        }
         
-        .doc-meta {{
+        .doc-meta {
             display: flex;
             gap: 12px;
             font-size: 11px;
             color: #666;
-        }}
+        }
         
-        .doc-source {{
+        .doc-source {
             color: #999;
-        }}
+        }
         
-        .doc-id {{
+        .doc-id {
             font-family: monospace;
             color: #667eea;
-        }}
+        }
         
-        .doc-preview-title {{
+        .doc-preview-title {
             font-weight: 600;
             margin-bottom: 4px;
-        }}
+        }
         
-        .doc-preview-list {{
+        .doc-preview-list {
             list-style: none;
             padding: 0;
             margin: 4px 0 0 0;
-        }}
+        }
         
-        .doc-preview-list li {{
+        .doc-preview-list li {
             padding: 2px 0;
             border-bottom: 1px solid #ffeaa7;
-        }}
+        }
         
-        .show-all-btn {{
+        .show-all-btn {
             margin-top: 8px;
             padding: 6px 12px;
             background: #667eea;
@@ -316,17 +337,17 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             cursor: pointer;
             font-size: 12px;
             transition: background 0.2s;
-        }}
+        }
         
-        .show-all-btn:hover {{
+        .show-all-btn:hover {
             background: #5568d3;
-        }}
+        }
         
-        .empty-state {{
+        .empty-state {
             text-align: center;
             padding: 60px 20px;
             color: #999;
-        }}
+        }
     </style>
 </head>
 <body>
@@ -342,263 +363,908 @@ def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: s
             </div>
             <button onclick="expandAll()" style="padding: 8px 16px; background: #667eea; color: white; border: none; border-radius: 4px; cursor: pointer;">Expand All</button>
             <button onclick="collapseAll()" style="padding: 8px 16px; background: #6c757d; color: white; border: none; border-radius: 4px; cursor: pointer;">Collapse All</button>
+            <span id="expandStatus" style="font-size: 13px; color: #666;"></span>
         </div>
         
         <div class="tree-container" id="treeContainer"></div>
     </div>
     
     <script>
-        const treeData = {tree_json};
-        const clustersData = {clusters_json};
+        const treeData = """.encode('utf-8')
+
+_HTML_MID = """;
+        const clusterShards = """.encode('utf-8')
+
+_HTML_FLAGS = """;
+        const NEEDS_FALLBACK = """.encode('utf-8')
+
+_HTML_TAIL = """;
+        
+        // Cluster details are loaded on demand, one shard script per group of cluster ids
+        const packedClusters = {};
+        const clustersData = {};
+        const scriptLoads = new Map();
+        const documentSearchTexts = {};
+        const titleSearchTexts = {};
+        const treeNodes = treeData.nodes || [];
+        const EXPAND_BATCH_SIZE = 200; // Nodes Expand All materializes per animation frame
+        const EXPAND_ALL_MAX_NODES = 5000; // Nodes one Expand All opens, bounding the DOM it builds
+        let expandQueue = [];
+        let expandBudget = 0;
+        let searchMatches = null;
+        let searchFrame = 0;
+        let searchRun = 0;
+        
+        // Called by each shard script with its string table and the clusters it holds
+        function registerClusters(strings, clusters) {
+            for (const id in clusters) {
+                packedClusters[id] = {strings, cluster: clusters[id]};
+            }
+        }
+        
+        // Unpack a cluster into {titles, documents} the first time it is shown
+        function getCluster(id) {
+            const key = String(id);
+            if (!(key in clustersData)) {
+                const packed = packedClusters[key];
+                clustersData[key] = packed ? unpackCluster(packed.strings, packed.cluster) : {};
+            }
+            return clustersData[key];
+        }
+        
+        // Strings are stored as indices into the shard's string table, documents as columns.
+        // Large clusters hold only their first documents, with the full counts under total
+        function unpackCluster(strings, cluster) {
+            const str = i => i == null ? undefined : strings[i];
+            const info = {};
+            if (cluster.titles) {
+                info.titles = cluster.titles.map(str);
+            }
+            if (cluster.documents) {
+                const columns = cluster.documents;
+                info.documents = columns.title.map((title, i) => ({
+                    title: str(title),
+                    source: str(columns.source[i]),
+                    documentId: str(columns.documentId[i]),
+                    chunkCount: columns.chunkCount[i],
+                }));
+            }
+            if (cluster.total) {
+                info.total = cluster.total;
+            }
+            return info;
+        }
+        
+        // Called by a cluster's detail script with the documents left out of its shard
+        function registerClusterDetails(strings, clusters) {
+            for (const id in clusters) {
+                const info = getCluster(id);
+                const rest = unpackCluster(strings, clusters[id]);
+                info.titles = (info.titles || []).concat(rest.titles || []);
+                info.documents = (info.documents || []).concat(rest.documents || []);
+                delete info.total;
+            }
+        }
+        
+        function loadClusterDetails(id) {
+            const key = String(id);
+            if (!getCluster(key).total) {
+                return Promise.resolve();
+            }
+            return loadScript(clusterShards.dir + '/detail-' + key + '.js');
+        }
+        
+        function loadShard(shard) {
+            return loadScript(clusterShards.dir + '/shard-' + shard + '.js');
+        }
+        
+        // Called by each search script with the lowercased document text of its clusters
+        function registerSearch(documentTexts, titleTexts) {
+            Object.assign(documentSearchTexts, documentTexts);
+            Object.assign(titleSearchTexts, titleTexts);
+        }
+        
+        // Document text is only needed once something is searched for
+        function loadSearch() {
+            return Promise.all(clusterShards.shards.map(shard => loadScript(clusterShards.dir + '/search-' + shard + '.js')));
+        }
+        
+        // Load a data script once; the promise also resolves if it fails, since shards
+        // without any cluster are not written and their clusters are simply missing
+        function loadScript(src) {
+            if (!scriptLoads.has(src)) {
+                scriptLoads.set(src, new Promise(resolve => {
+                    const script = document.createElement('script');
+                    script.src = src;
+                    script.onload = resolve;
+                    script.onerror = resolve;
+                    document.head.appendChild(script);
+                }));
+            }
+            return scriptLoads.get(src);
+        }
         
-        function renderTree() {{
+        function renderTree() {
             const container = document.getElementById('treeContainer');
             
-            if (!treeData.tree || treeData.tree.length === 0) {{
+            if (!treeData.roots || treeData.roots.length === 0) {
                 container.innerHTML = '<div class="empty-state">No tree data available</div>';
                 return;
-            }}
+            }
             
-            container.innerHTML = treeData.tree.map(node => renderNode(node)).join('');
+            container.innerHTML = treeData.roots.map(renderNode).join('');
             
-            // Attach click handlers
-            document.querySelectorAll('.tree-node-header').forEach(header => {{
-                header.addEventListener('click', function() {{
-                    const node = this.closest('.tree-node');
-                    node.classList.toggle('expanded');
-                    this.classList.toggle('expanded');
-                }});
-            }});
-        }}
-        
-        function renderNode(node, depth = 0) {{
-            const clusterId = node.cluster_id;
-            const hasChildren = node.children && node.children.length > 0;
-            const isLeaf = !hasChildren;
+            // One delegated click handler, since nodes are added as the tree is expanded
+            container.addEventListener('click', function(e) {
+                const header = e.target.closest('.tree-node-header');
+                if (!header) return;
+                const node = header.closest('.tree-node');
+                node.classList.toggle('expanded');
+                header.classList.toggle('expanded');
+                if (node.classList.contains('expanded')) {
+                    showNode(node);
+                }
+            });
             
-            // For parent nodes, use exclusive_clusters (documents not in children)
-            // For leaf nodes, use final_clusters (all documents in the node)
-            const clustersToShow = hasChildren 
+            // Top-level leaves start out expanded, so their details are visible right away
+            container.querySelectorAll(':scope > .tree-node.expanded').forEach(loadDetails);
+        }
+        
+        // For parent nodes, use exclusive_clusters (documents not in children)
+        // For leaf nodes, use final_clusters (all documents in the node)
+        function clustersToShowFor(index) {
+            const node = treeNodes[index];
+            return treeData.children[index].length > 0
                 ? (node.exclusive_clusters || [])
                 : (node.final_clusters || []);
-            
-            let allDocuments = [];
-            let allTitles = [];
+        }
+        
+        // Each node's own markup is prebuilt by the generator. Children are left out until their
+        // parent is first expanded, so the page only holds the nodes that have been visible
+        function renderNode(index) {
+            if (treeData.children[index].length === 0) {
+                return treeData.node_html[index] + '</div>';
+            }
+            return treeData.node_html[index] + '<div class="tree-node-children"></div></div>';
+        }
+        
+        // Add a node's children to the page once; returns the newly added child elements
+        function materializeChildren(nodeEl) {
+            const childrenEl = nodeEl.querySelector(':scope > .tree-node-children');
+            if (!childrenEl || nodeEl.materialized) return [];
+            nodeEl.materialized = true;
+            childrenEl.innerHTML = treeData.children[Number(nodeEl.dataset.node)].map(renderNode).join('');
+            const childEls = Array.from(childrenEl.children);
+            if (searchMatches) {
+                childEls.forEach(applySearch);
+            }
+            return childEls;
+        }
+        
+        // An expanded node shows its own details and those of its direct children
+        function showNode(nodeEl) {
+            materializeChildren(nodeEl);
+            const loads = [loadDetails(nodeEl)];
+            nodeEl.querySelectorAll(':scope > .tree-node-children > .tree-node').forEach(child => {
+                loads.push(loadDetails(child));
+            });
+            return Promise.all(loads);
+        }
+        
+        // Load the clusters of a node and render its document preview and details once
+        function loadDetails(nodeEl) {
+            if (!nodeEl.detailsLoad) {
+                const index = Number(nodeEl.dataset.node);
+                const node = treeNodes[index];
+                let clusterIds = clustersToShowFor(index);
+                // Fallback: if no clusters mapped, try direct lookup (backward compatibility)
+                if (NEEDS_FALLBACK && clusterIds.length === 0) {
+                    clusterIds = [node.cluster_id];
+                }
+                const shards = new Set(clusterIds.map(id => Number(id) % clusterShards.count));
+                nodeEl.detailsLoad = Promise.all(Array.from(shards, loadShard)).then(() => {
+                    nodeEl.querySelector(':scope > .node-details').appendChild(renderDetails(index));
+                });
+            }
+            return nodeEl.detailsLoad;
+        }
+        
+        // Aggregate the loaded documents of a node's clusters, along with their full counts
+        function nodeDocuments(index) {
+            const node = treeNodes[index];
+            const clustersToShow = clustersToShowFor(index);
+            const result = {clusterIds: [], documents: [], titles: [], documentCount: 0, titleCount: 0};
+            const add = (id, clusterInfo) => {
+                const total = clusterInfo.total || {};
+                result.clusterIds.push(id);
+                result.documents = result.documents.concat(clusterInfo.documents || []);
+                result.titles = result.titles.concat(clusterInfo.titles || []);
+                result.documentCount += total.documents ?? (clusterInfo.documents || []).length;
+                result.titleCount += total.titles ?? (clusterInfo.titles || []).length;
+            };
             
             // Aggregate documents from the clusters to show
-            for (const finalClusterId of clustersToShow) {{
-                const clusterInfo = clustersData[String(finalClusterId)] || {{}};
-                if (clusterInfo.documents) {{
-                    allDocuments = allDocuments.concat(clusterInfo.documents);
-                    allTitles = allTitles.concat(clusterInfo.titles || []);
-                }}
-            }}
+            for (const finalClusterId of clustersToShow) {
+                const clusterInfo = getCluster(finalClusterId);
+                if (clusterInfo.documents) {
+                    add(finalClusterId, clusterInfo);
+                }
+            }
             
             // Fallback: if no clusters mapped, try direct lookup (backward compatibility)
-            if (allDocuments.length === 0 && clustersToShow.length === 0) {{
-                const clusterInfo = clustersData[String(clusterId)] || {{}};
-                allDocuments = clusterInfo.documents || [];
-                allTitles = clusterInfo.titles || [];
-            }}
+            if (NEEDS_FALLBACK && clustersToShow.length === 0) {
+                add(node.cluster_id, getCluster(node.cluster_id));
+            }
+            return result;
+        }
+        
+        function renderDetails(index) {
+            const node = treeNodes[index];
+            const clusterId = node.cluster_id;
+            const hasChildren = treeData.children[index].length > 0;
+            const clustersToShow = clustersToShowFor(index);
+            const allFinalClusters = node.final_clusters || [];
             
-            const docCount = allDocuments.length || allTitles.length || 0;
+            const {documents: allDocuments, titles: allTitles, documentCount, titleCount} = nodeDocuments(index);
+            const docCount = documentCount || titleCount || 0;
             
             // Preview of document names (first 3)
             const previewTitles = allTitles.slice(0, 3);
-            const previewText = previewTitles.length > 0 
-                ? previewTitles.join(', ') + (allTitles.length > 3 ? ` (+${{allTitles.length - 3}} more)` : '')
+            const previewText = previewTitles.length > 0
+                ? previewTitles.join(', ') + (titleCount > 3 ? ` (+${titleCount - 3} more)` : '')
                 : '';
             
-            // Show cluster mapping - exclusive for parents, all for leaves
-            const allFinalClusters = node.final_clusters || [];
-            const clusterMappingText = clustersToShow.length > 0 
-                ? (hasChildren 
-                    ? ` → Exclusive: [${{clustersToShow.join(', ')}}] (of [${{allFinalClusters.join(', ')}}])`
-                    : ` → Final: [${{clustersToShow.join(', ')}}]`)
-                : '';
-            
-            let html = `
-                <div class="tree-node ${{hasChildren ? '' : 'expanded'}}">
-                    <div class="tree-node-header ${{hasChildren ? 'collapsed' : 'leaf'}} ${{hasChildren ? '' : 'expanded'}}">
-                        <span class="toggle"></span>
-                        <div class="node-info">
-                            <span class="node-label">Tree Node ${{clusterId}}${{clusterMappingText}}</span>
-                            <div class="node-meta">
-                                <span class="meta-item">
-                                    <span class="meta-badge">λ: ${{node.lambda_val.toFixed(4)}}</span>
-                                </span>
-                                ${{docCount > 0 ? `<span class="meta-item">Docs: ${{docCount}}</span>` : ''}}
-                            </div>
-                        </div>
-                    </div>
-            `;
+            const fragment = document.createDocumentFragment();
             
             // Add document preview in header area (always visible when expanded)
-            if (docCount > 0 && previewText) {{
-                html += `
-                    <div class="doc-preview">
-                        <div class="doc-preview-title">Document Names (${{docCount}}):</div>
-                        <div style="font-size: 12px; color: #856404;">${{escapeHtml(previewText)}}</div>
-                    </div>
-                `;
-            }}
+            if (docCount > 0 && previewText) {
+                const preview = createElement('div', 'doc-preview');
+                preview.appendChild(createElement('div', 'doc-preview-title', `Document Names (${docCount}):`));
+                const previewNames = createElement('div', null, previewText);
+                previewNames.style.cssText = 'font-size: 12px; color: #856404;';
+                preview.appendChild(previewNames);
+                fragment.appendChild(preview);
+            }
             
             // Add full cluster details with all documents
-            if (allDocuments.length > 0 || allTitles.length > 0) {{
+            if (docCount > 0) {
                 // Use documents array if available (has more info), otherwise use titles
-                const itemsToShow = allDocuments.length > 0 ? allDocuments : allTitles.map(t => ({{title: t}}));
-                const uniqueId = 'cluster-' + clusterId + '-' + Math.random().toString(36).substr(2, 9);
-                const initialLimit = 20; // Show first 20 by default
-                const showAll = itemsToShow.length <= initialLimit;
+                const itemsToShow = documentCount > 0 ? allDocuments : allTitles.map(t => ({title: t}));
+                const itemCount = documentCount > 0 ? documentCount : titleCount;
+                // Node indices are assigned once by the generator, so they are stable and unique
+                const uniqueId = 'cluster-' + index;
+                const initialLimit = clusterShards.previewLimit; // Show the first documents by default
+                const showAll = itemCount <= initialLimit;
                 
                 const clusterLabel = hasChildren
-                    ? `Tree Node ${{clusterId}} (Exclusive Clusters: ${{clustersToShow.join(', ')}} of ${{allFinalClusters.join(', ')}})`
-                    : `Tree Node ${{clusterId}} (Final Clusters: ${{clustersToShow.join(', ')}})`;
+                    ? `Tree Node ${clusterId} (Exclusive Clusters: ${clustersToShow.join(', ')} of ${allFinalClusters.join(', ')})`
+                    : `Tree Node ${clusterId} (Final Clusters: ${clustersToShow.join(', ')})`;
                 
-                html += `
-                    <div class="cluster-details">
-                        <h4>All Documents in ${{clusterLabel}} (${{itemsToShow.length}})</h4>
-                        <ul class="doc-list" id="${{uniqueId}}-list">
-                            ${{itemsToShow.slice(0, initialLimit).map((item, idx) => {{
-                                const doc = typeof item === 'string' ? {{title: item}} : item;
-                                return `
-                                <li class="doc-item">
-                                    <div class="doc-title">${{escapeHtml(doc.title || 'Untitled')}}</div>
-                                    <div class="doc-meta">
-                                        ${{doc.source ? `<span class="doc-source">Source: ${{escapeHtml(doc.source)}}</span>` : ''}}
-                                        ${{doc.documentId ? `<span class="doc-id">ID: ${{escapeHtml(doc.documentId)}}</span>` : ''}}
-                                        ${{doc.chunkCount ? `<span>Chunks: ${{doc.chunkCount}}</span>` : ''}}
-                                    </div>
-                                </li>
-                                `;
-                            }}).join('')}}
-                        </ul>
-                        ${{!showAll ? `
-                            <ul class="doc-list" id="${{uniqueId}}-more" style="display: none;">
-                                ${{itemsToShow.slice(initialLimit).map((item, idx) => {{
-                                    const doc = typeof item === 'string' ? {{title: item}} : item;
-                                    return `
-                                    <li class="doc-item">
-                                        <div class="doc-title">${{escapeHtml(doc.title || 'Untitled')}}</div>
-                                        <div class="doc-meta">
-                                            ${{doc.source ? `<span class="doc-source">Source: ${{escapeHtml(doc.source)}}</span>` : ''}}
-                                            ${{doc.documentId ? `<span class="doc-id">ID: ${{escapeHtml(doc.documentId)}}</span>` : ''}}
-                                            ${{doc.chunkCount ? `<span>Chunks: ${{doc.chunkCount}}</span>` : ''}}
-                                        </div>
-                                    </li>
-                                    `;
-                                }}).join('')}}
-                            </ul>
-                            <button class="show-all-btn" onclick="toggleDocuments('${{uniqueId}}')" id="${{uniqueId}}-btn">
-                                Show All ${{itemsToShow.length}} Documents
-                            </button>
-                        ` : ''}}
-                    </div>
-                `;
-            }}
-            
-            // Add children
-            if (hasChildren) {{
-                html += '<div class="tree-node-children">';
-                html += node.children.map(child => renderNode(child, depth + 1)).join('');
-                html += '</div>';
-            }}
+                const details = createElement('div', 'cluster-details');
+                details.appendChild(createElement('h4', null, `All Documents in ${clusterLabel} (${itemCount})`));
+                
+                const list = createElement('ul', 'doc-list');
+                list.id = uniqueId + '-list';
+                for (const item of itemsToShow.slice(0, initialLimit)) {
+                    list.appendChild(renderDocItem(item));
+                }
+                details.appendChild(list);
+                
+                if (!showAll) {
+                    const moreList = createElement('ul', 'doc-list');
+                    moreList.id = uniqueId + '-more';
+                    moreList.style.display = 'none';
+                    details.appendChild(moreList);
+                    
+                    const btn = createElement('button', 'show-all-btn', `Show All ${itemCount} Documents`);
+                    btn.id = uniqueId + '-btn';
+                    btn.addEventListener('click', () => showMoreDocuments(index, moreList, initialLimit).then(() => toggleDocuments(uniqueId)));
+                    details.appendChild(btn);
+                }
+                
+                fragment.appendChild(details);
+            }
             
-            html += '</div>';
-            return html;
-        }}
-        
-        function escapeHtml(text) {{
-            if (text == null) return '';
-            const div = document.createElement('div');
-            div.textContent = String(text);
-            return div.innerHTML;
-        }}
-        
-        function toggleDocuments(uniqueId) {{
+            return fragment;
+        }
+        
+        // The documents past the initial limit are only rendered the first time "Show All" is
+        // clicked, after loading the clusters whose shards hold just their first documents
+        function showMoreDocuments(index, moreList, initialLimit) {
+            if (!moreList.documentsLoad) {
+                const {clusterIds} = nodeDocuments(index);
+                moreList.documentsLoad = Promise.all(clusterIds.map(loadClusterDetails)).then(() => {
+                    const {documents, titles} = nodeDocuments(index);
+                    const items = documents.length > 0 ? documents : titles.map(t => ({title: t}));
+                    for (const item of items.slice(initialLimit)) {
+                        moreList.appendChild(renderDocItem(item));
+                    }
+                });
+            }
+            return moreList.documentsLoad;
+        }
+        
+        function renderDocItem(item) {
+            const doc = typeof item === 'string' ? {title: item} : item;
+            const li = createElement('li', 'doc-item');
+            li.appendChild(createElement('div', 'doc-title', doc.title || 'Untitled'));
+            const meta = createElement('div', 'doc-meta');
+            if (doc.source) {
+                meta.appendChild(createElement('span', 'doc-source', `Source: ${doc.source}`));
+            }
+            if (doc.documentId) {
+                meta.appendChild(createElement('span', 'doc-id', `ID: ${doc.documentId}`));
+            }
+            if (doc.chunkCount) {
+                meta.appendChild(createElement('span', null, `Chunks: ${doc.chunkCount}`));
+            }
+            li.appendChild(meta);
+            return li;
+        }
+        
+        // Text is set through textContent, so document titles never need HTML escaping
+        function createElement(tag, className, text) {
+            const el = document.createElement(tag);
+            if (className) {
+                el.className = className;
+            }
+            if (text != null) {
+                el.textContent = text;
+            }
+            return el;
+        }
+        
+        function toggleDocuments(uniqueId) {
             const moreList = document.getElementById(uniqueId + '-more');
             const btn = document.getElementById(uniqueId + '-btn');
-            if (moreList && btn) {{
-                if (moreList.style.display === 'none') {{
+            if (moreList && btn) {
+                if (moreList.style.display === 'none') {
                     moreList.style.display = 'block';
                     btn.textContent = 'Show Less';
-                }} else {{
+                } else {
                     moreList.style.display = 'none';
                     const totalCount = moreList.querySelectorAll('.doc-item').length;
                     const list = document.getElementById(uniqueId + '-list');
                     const shownCount = list ? list.querySelectorAll('.doc-item').length : 0;
-                    btn.textContent = `Show All ${{shownCount + totalCount}} Documents`;
-                }}
-            }}
-        }}
+                    btn.textContent = `Show All ${shownCount + totalCount} Documents`;
+                }
+            }
+        }
         
-        function expandAll() {{
-            document.querySelectorAll('.tree-node').forEach(node => {{
+        // Expand the tree a batch of nodes per frame, adding each level as its parents open,
+        // so the page stays responsive on large trees. Levels open top-down until
+        // EXPAND_ALL_MAX_NODES new nodes have been opened; clicking again opens the next ones
+        function expandAll() {
+            const idle = expandQueue.length === 0;
+            expandQueue = Array.from(document.querySelectorAll('.tree-node'));
+            expandBudget = EXPAND_ALL_MAX_NODES;
+            document.getElementById('expandStatus').textContent = '';
+            if (idle) {
+                expandBatch();
+            }
+        }
+        
+        function expandBatch() {
+            for (const node of expandQueue.splice(0, EXPAND_BATCH_SIZE)) {
+                // Nodes opened before (by a click or an earlier Expand All) cost nothing
+                const hasChildren = treeData.children[Number(node.dataset.node)].length > 0;
+                if (!node.detailsLoad || (hasChildren && !node.materialized)) {
+                    if (expandBudget === 0) {
+                        expandQueue = [];
+                        document.getElementById('expandStatus').textContent =
+                            `Expanded ${EXPAND_ALL_MAX_NODES} nodes; click Expand All again to open more`;
+                        return;
+                    }
+                    expandBudget--;
+                }
                 node.classList.add('expanded');
                 const header = node.querySelector('.tree-node-header');
-                if (header && !header.classList.contains('leaf')) {{
+                if (header && !header.classList.contains('leaf')) {
                     header.classList.add('expanded');
                     header.classList.remove('collapsed');
-                }}
-            }});
-        }}
+                }
+                loadDetails(node);
+                expandQueue.push(...materializeChildren(node));
+            }
+            if (expandQueue.length > 0) {
+                requestAnimationFrame(expandBatch);
+            }
+        }
         
-        function collapseAll() {{
-            document.querySelectorAll('.tree-node').forEach(node => {{
+        function collapseAll() {
+            expandQueue = [];
+            document.getElementById('expandStatus').textContent = '';
+            document.querySelectorAll('.tree-node').forEach(node => {
                 node.classList.remove('expanded');
                 const header = node.querySelector('.tree-node-header');
-                if (header && !header.classList.contains('leaf')) {{
+                if (header && !header.classList.contains('leaf')) {
                     header.classList.remove('expanded');
                     header.classList.add('collapsed');
-                }}
-            }});
-        }}
-        
-        // Search functionality
-        document.getElementById('searchInput').addEventListener('input', function(e) {{
-            const searchTerm = e.target.value.toLowerCase();
-            if (!searchTerm) {{
-                document.querySelectorAll('.tree-node').forEach(node => {{
-                    node.style.display = '';
-                }});
+                }
+            });
+        }
+        
+        // Search functionality: at most one search per frame while typing
+        document.getElementById('searchInput').addEventListener('input', function() {
+            cancelAnimationFrame(searchFrame);
+            searchFrame = requestAnimationFrame(runSearch);
+        });
+        
+        function runSearch() {
+            const searchTerm = document.getElementById('searchInput').value.toLowerCase();
+            const run = ++searchRun;
+            if (!searchTerm) {
+                searchMatches = null;
+                document.querySelectorAll('.tree-node').forEach(applySearch);
                 return;
-            }}
-            
-            document.querySelectorAll('.tree-node').forEach(node => {{
-                const text = node.textContent.toLowerCase();
-                if (text.includes(searchTerm)) {{
-                    node.style.display = '';
-                    // Expand parent nodes
-                    let parent = node.parentElement;
-                    while (parent && parent.classList.contains('tree-node')) {{
-                        parent.classList.add('expanded');
-                        const header = parent.querySelector('.tree-node-header');
-                        if (header) {{
-                            header.classList.add('expanded');
-                            header.classList.remove('collapsed');
-                        }}
-                        parent = parent.parentElement;
-                    }}
-                }} else {{
-                    node.style.display = 'none';
-                }}
-            }});
-        }});
+            }
+            loadSearch().then(() => {
+                // A newer search started while the search scripts were loading
+                if (run !== searchRun) {
+                    return;
+                }
+                // Match the node label and the documents the node lists. Nodes are numbered in
+                // depth-first order, so one reverse pass also keeps every ancestor of a match
+                const search = treeData.search;
+                searchMatches = new Array(search.length);
+                for (let i = search.length - 1; i >= 0; i--) {
+                    searchMatches[i] = search[i].includes(searchTerm)
+                        || nodeMatchesSearch(i, searchTerm)
+                        || treeData.children[i].some(child => searchMatches[child]);
+                }
+                document.querySelectorAll('.tree-node').forEach(applySearch);
+            });
+        }
+        
+        // Nodes list the documents of their clusters to show; only a node without any
+        // falls back to its own cluster, whose titles are listed if it has no documents
+        function nodeMatchesSearch(index, searchTerm) {
+            const matches = text => text !== undefined && text.includes(searchTerm);
+            const clustersToShow = clustersToShowFor(index);
+            if (clustersToShow.length > 0) {
+                return clustersToShow.some(id => matches(documentSearchTexts[String(id)]));
+            }
+            if (!NEEDS_FALLBACK) {
+                return false;
+            }
+            const key = String(treeNodes[index].cluster_id);
+            return matches(key in documentSearchTexts ? documentSearchTexts[key] : titleSearchTexts[key]);
+        }
+        
+        function applySearch(nodeEl) {
+            const visible = !searchMatches || searchMatches[Number(nodeEl.dataset.node)];
+            nodeEl.style.display = visible ? '' : 'none';
+        }
         
         // Initial render
         renderTree();
     </script>
 </body>
-</html>"""
+</html>""".encode('utf-8')
+
+
+def _dump_json(data) -> bytes:
+    """
+    Serialize data to compact JSON bytes, with orjson when it is installed.
+    
+    The output is safe to embed inside a <script> element.
+    
+    Args:
+        data: Tree or cluster data (may contain numpy values and non-string keys)
+        
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    # A "</script" inside a string would end the script element early. "\/" is a valid
+    # JSON escape for "/", so escaping on the encoded bytes keeps the data unchanged
+    return payload.replace(b"</", b"<\\/")
+
+
+def _walk_tree(tree: List[Dict]) -> Iterator[Dict]:
+    """Yield every node of the tree in depth-first order, without recursion."""
+    stack = list(reversed(tree))
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.get('children') or []))
+
+
+def _referenced_cluster_ids(tree: List[Dict], needs_fallback: bool) -> Set[str]:
+    """
+    Collect the ids of the clusters whose details the page can show, as strings.
+    
+    Args:
+        tree: Root nodes of the tree
+        needs_fallback: Whether nodes without mapped clusters fall back to their own cluster id
+        
+    Returns:
+        Exclusive clusters of parents, final clusters of leaves, and fallback cluster ids
+    """
+    referenced_ids = set()
+    for node in _walk_tree(tree):
+        clusters_to_show = node.get('exclusive_clusters' if node.get('children') else 'final_clusters') or []
+        referenced_ids.update(str(cluster_id) for cluster_id in clusters_to_show)
+        if not clusters_to_show and needs_fallback:
+            referenced_ids.add(str(node['cluster_id']))
+    return referenced_ids
+
+
+def _write_json_lists(f, data: Dict[str, List]):
+    """
+    Write a dict of lists as JSON, serializing each list a chunk of items at a time.
+    
+    Only one chunk is held as encoded bytes at once, instead of the whole payload.
+    
+    Args:
+        f: Binary file to write to
+        data: Dictionary whose values are all lists
+    """
+    f.write(b"{")
+    for i, (key, values) in enumerate(data.items()):
+        if i:
+            f.write(b",")
+        f.write(_dump_json(key))
+        f.write(b":[")
+        for start in range(0, len(values), JSON_WRITE_CHUNK):
+            if start:
+                f.write(b",")
+            # Chunks split between items, so each one is written without its own brackets
+            f.write(memoryview(_dump_json(values[start:start + JSON_WRITE_CHUNK]))[1:-1])
+        f.write(b"]")
+    f.write(b"}")
+
+
+def _node_documents(node: Dict, clusters_to_show: List, clusters_data: Dict, needs_fallback: bool) -> Tuple[List, List]:
+    """
+    Collect a node's documents the same way the page lists them.
+    
+    Args:
+        node: Tree node
+        clusters_to_show: Exclusive clusters of a parent, or final clusters of a leaf
+        clusters_data: Cluster information from format_results
+        needs_fallback: Whether nodes without mapped clusters fall back to their own cluster id
+        
+    Returns:
+        Tuple of (documents, titles) shown for the node
+    """
+    documents = []
+    titles = []
+    if clusters_to_show:
+        for cluster_id in clusters_to_show:
+            info = clusters_data.get(str(cluster_id)) or {}
+            if info.get('documents'):
+                documents.extend(info['documents'])
+                titles.extend(info.get('titles') or [])
+    elif needs_fallback:
+        # Nodes without mapped clusters fall back to their own cluster id
+        info = clusters_data.get(str(node['cluster_id'])) or {}
+        documents = info.get('documents') or []
+        titles = info.get('titles') or []
+    return documents, titles
+
+
+def _cluster_search_text(info: Dict) -> Tuple[str, bool]:
+    """
+    Lowercased text the page's search matches a cluster's documents against.
+    
+    Each distinct title, source and document ID is included once, so a source shared by
+    every document of the cluster does not repeat.
+    
+    Returns:
+        Tuple of (search text, whether it came from documents rather than titles only)
+    """
+    documents = info.get('documents') or []
+    if documents:
+        values = []
+        for doc in documents:
+            if isinstance(doc, str):
+                values.append(doc)
+            else:
+                values.extend(str(doc[key]) for key in ('title', 'source', 'documentId') if doc.get(key))
+    else:
+        values = [str(title) for title in info.get('titles') or []]
+    return "\n".join(dict.fromkeys(value.lower() for value in values)), bool(documents)
+
+
+def _flatten_tree(tree: List[Dict], clusters_data: Dict, needs_fallback: bool) -> Dict:
+    """
+    Flatten the tree into the arrays the page draws it from, with each node's markup prebuilt.
+    
+    Nodes are numbered in depth-first order, so concatenating node_html in that order
+    (with each node's children nested inside it) reproduces the tree.
     
-    # Write HTML file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    Args:
+        tree: Root nodes of the cluster tree
+        clusters_data: Cluster information, used to count and index each node's documents
+        needs_fallback: Whether nodes without mapped clusters fall back to their own cluster id
+        
+    Returns:
+        Dictionary with root indices, child indices per node, node_html and lowercased
+        label per node for search, and the cluster ids of each node needed to load its details
+    """
+    roots = []
+    children = []
+    nodes = []
+    node_html = []
+    search = []
+    stack = [(node, roots) for node in reversed(tree)]
+    while stack:
+        node, siblings = stack.pop()
+        index = len(nodes)
+        siblings.append(index)
+        node_children = node.get('children') or []
+        has_children = bool(node_children)
+        
+        entry = {'cluster_id': node['cluster_id']}
+        for key in ('final_clusters', 'exclusive_clusters'):
+            if key in node:
+                entry[key] = node[key]
+        nodes.append(entry)
+        
+        # Show cluster mapping - exclusive for parents, all for leaves
+        clusters_to_show = (node.get('exclusive_clusters') if has_children else node.get('final_clusters')) or []
+        label = str(node['cluster_id'])
+        if clusters_to_show:
+            shown = ', '.join(map(str, clusters_to_show))
+            if has_children:
+                all_final = ', '.join(map(str, node.get('final_clusters') or []))
+                label += f" → Exclusive: [{shown}] (of [{all_final}])"
+            else:
+                label += f" → Final: [{shown}]"
+        documents, titles = _node_documents(node, clusters_to_show, clusters_data, needs_fallback)
+        doc_count = len(documents) or len(titles)
+        # Only the label is searched inline; document text is loaded from the search scripts
+        search.append(f"Tree Node {label}".lower())
+        
+        node_html.append(_NODE_HTML.format_map({
+            'node_class': '' if has_children else ' expanded',
+            'index': index,
+            'header_class': 'collapsed' if has_children else 'leaf expanded',
+            'label': html.escape(label),
+            'lambda_str': f"{node['lambda_val']:.4f}",
+            'doc_count': f'<span class="meta-item">Docs: {doc_count}</span>' if doc_count > 0 else '',
+        }))
+        
+        child_indices = []
+        children.append(child_indices)
+        stack.extend((child, child_indices) for child in reversed(node_children))
+    
+    return {'roots': roots, 'children': children, 'nodes': nodes, 'node_html': node_html, 'search': search}
+
+
+def _pack_clusters(clusters: Dict) -> Tuple[List, Dict]:
+    """
+    Pack clusters into the compact shape the page unpacks, with repeated strings interned.
+    
+    Titles, sources and document IDs are replaced by indices into one string table, so a
+    source shared by thousands of documents (or a title listed in both titles and documents)
+    is stored once. Documents are stored as columns, keeping only the fields the page shows.
+    
+    Args:
+        clusters: Cluster information keyed by cluster id
+        
+    Returns:
+        Tuple of (string table, packed clusters keyed by cluster id)
+    """
+    index = {}
+    
+    def intern(value):
+        return None if value is None else index.setdefault(value, len(index))
+    
+    packed = {}
+    for cluster_id, info in clusters.items():
+        entry = {}
+        if info.get('titles') is not None:
+            entry['titles'] = [intern(title) for title in info['titles']]
+        if info.get('documents'):
+            docs = [{'title': doc} if isinstance(doc, str) else doc for doc in info['documents']]
+            entry['documents'] = {
+                'title': [intern(doc.get('title')) for doc in docs],
+                'source': [intern(doc.get('source')) for doc in docs],
+                'documentId': [intern(doc.get('documentId')) for doc in docs],
+                'chunkCount': [doc.get('chunkCount') for doc in docs],
+            }
+        if info.get('total'):
+            entry['total'] = info['total']
+        packed[cluster_id] = entry
+    return list(index), packed
+
+
+def _split_cluster(info: Dict) -> Tuple[Dict, Dict]:
+    """
+    Split a cluster into the documents the page lists up front and the ones behind "Show All".
+    
+    A node lists its first DOCUMENT_PREVIEW_LIMIT documents, which never take more than that
+    many from any one cluster, so the shards only need each cluster's first ones.
+    
+    Args:
+        info: Cluster information from format_results
+        
+    Returns:
+        Tuple of (cluster truncated to the preview limit with its full counts under 'total',
+        remaining titles and documents), or (info, None) if nothing needs truncating
+    """
+    titles = info.get('titles') or []
+    documents = info.get('documents') or []
+    if len(titles) <= DOCUMENT_PREVIEW_LIMIT and len(documents) <= DOCUMENT_PREVIEW_LIMIT:
+        return info, None
+    head = {
+        'titles': titles[:DOCUMENT_PREVIEW_LIMIT],
+        'documents': documents[:DOCUMENT_PREVIEW_LIMIT],
+        'total': {'titles': len(titles), 'documents': len(documents)},
+    }
+    rest = {
+        'titles': titles[DOCUMENT_PREVIEW_LIMIT:],
+        'documents': documents[DOCUMENT_PREVIEW_LIMIT:],
+    }
+    return head, rest
+
+
+def _write_register_script(path: str, callback: bytes, clusters: Dict):
+    """Write a script passing packed clusters to the page function named by callback."""
+    strings, packed = _pack_clusters(clusters)
+    with open(path, 'wb') as f:
+        f.write(callback)
+        f.write(b"(")
+        f.write(_dump_json(strings))
+        f.write(b",")
+        f.write(_dump_json(packed))
+        f.write(b");\n")
+
+
+def _write_cluster_shards(clusters_data: Dict, cluster_dir: str) -> List[int]:
+    """
+    Write cluster details as CLUSTER_SHARDS script files the page loads on demand.
+    
+    Shards are scripts rather than JSON so the page can load them with <script> tags,
+    which unlike fetch() also works when the viewer is opened from the local filesystem.
+    Clusters with more than DOCUMENT_PREVIEW_LIMIT documents keep only their first ones in
+    the shard; the rest go to a "detail-<cluster id>.js" script loaded on "Show All".
+    The text searched for each cluster's documents goes to a "search-<shard>.js" script
+    per shard, which the page only loads once something is searched for.
+    
+    Args:
+        clusters_data: Cluster information from format_results
+        cluster_dir: Directory to write the shard files to
+        
+    Returns:
+        Sorted numbers of the shards written
+    """
+    os.makedirs(cluster_dir, exist_ok=True)
+    # Shards left over from an earlier run would otherwise be loaded for clusters that no longer exist
+    for name in os.listdir(cluster_dir):
+        if name.startswith(('shard-', 'detail-', 'search-')) and name.endswith('.js'):
+            os.remove(os.path.join(cluster_dir, name))
+    
+    shards = defaultdict(dict)
+    # Per shard: search text of clusters with documents, and of clusters with titles only
+    search_shards = defaultdict(lambda: ({}, {}))
+    for cluster_id, info in clusters_data.items():
+        shard = int(cluster_id) % CLUSTER_SHARDS
+        head, rest = _split_cluster(info)
+        shards[shard][str(cluster_id)] = head
+        text, from_documents = _cluster_search_text(info)
+        search_shards[shard][0 if from_documents else 1][str(cluster_id)] = text
+        if rest:
+            _write_register_script(
+                os.path.join(cluster_dir, f"detail-{cluster_id}.js"), b"registerClusterDetails", {str(cluster_id): rest}
+            )
+    
+    for shard, clusters in shards.items():
+        _write_register_script(os.path.join(cluster_dir, f"shard-{shard}.js"), b"registerClusters", clusters)
+        document_texts, title_texts = search_shards[shard]
+        with open(os.path.join(cluster_dir, f"search-{shard}.js"), 'wb') as f:
+            f.write(b"registerSearch(")
+            f.write(_dump_json(document_texts))
+            f.write(b",")
+            f.write(_dump_json(title_texts))
+            f.write(b");\n")
+    return sorted(shards)
+
+
+def create_tree_viewer_html(tree_data: dict, clusters_data: dict, output_path: str):
+    """
+    Create an HTML file with an interactive tree viewer for exploring the cluster hierarchy.
+    
+    Only the tree's prebuilt node markup is embedded in the page; cluster details go to a
+    companion "<output_path>.clusters" directory and are loaded as nodes are expanded.
+    
+    Args:
+        tree_data: Tree structure from extract_tree_structure
+        clusters_data: Cluster information from format_results
+        output_path: Path to save the HTML file (gzip-compressed if it ends in .gz)
+    """
+    # Resolve output path to absolute path
+    if not os.path.isabs(output_path):
+        output_path = os.path.abspath(output_path)
+    
+    # Create output directory if it doesn't exist
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    
+    compress = output_path.endswith('.gz')
+    # Name the details directory after the page as served, i.e. without the .gz suffix
+    cluster_dir = (output_path[:-len('.gz')] if compress else output_path) + '.clusters'
+    tree = tree_data.get('tree') or []
+    # The page only needs the direct cluster lookup for trees written without cluster mappings;
+    # deciding once here keeps that branch out of the page's render path for current results
+    needs_fallback = any(
+        'exclusive_clusters' not in node and 'final_clusters' not in node for node in _walk_tree(tree)
+    )
+    # Clusters no node shows would only take up space in the shards
+    referenced_ids = _referenced_cluster_ids(tree, needs_fallback)
+    written_shards = _write_cluster_shards(
+        {cluster_id: info for cluster_id, info in clusters_data.items() if str(cluster_id) in referenced_ids},
+        cluster_dir,
+    )
+    skeleton = _flatten_tree(tree, clusters_data, needs_fallback)
+    shard_info = {
+        'dir': quote(os.path.basename(cluster_dir)),
+        'count': CLUSTER_SHARDS,
+        'shards': written_shards,
+        'previewLimit': DOCUMENT_PREVIEW_LIMIT,
+    }
+    
+    # Write the page in parts: the static template around the serialized data, which is
+    # streamed into the buffered file chunk by chunk instead of one giant string.
+    # The JSON is only read by the page's script, so it is written compact rather than indented
+    if compress:
+        f = gzip.open(output_path, 'wb', compresslevel=GZIP_COMPRESS_LEVEL)
+    else:
+        f = open(output_path, 'wb', buffering=OUTPUT_BUFFER_SIZE)
+    with f:
+        f.write(_HTML_HEAD)
+        _write_json_lists(f, skeleton)
+        f.write(_HTML_MID)
+        f.write(_dump_json(shard_info))
+        f.write(_HTML_FLAGS)
+        f.write(b"true" if needs_fallback else b"false")
+        f.write(_HTML_TAIL)
     
     print(f"✓ Tree viewer HTML saved to: {output_path}")
+    print(f"✓ Cluster details saved to: {cluster_dir}")
     print(f"  Open it in your browser to explore the cluster hierarchy")
 
 
+def load_results(input_path: str) -> Tuple[Dict, Dict]:
+    """
+    Read the 'tree' and 'clusters' sections of a cluster results file.
+    
+    With ijson installed, the file is parsed as a stream and only those two sections are
+    built in memory; everything else (such as the noise documents) is skipped. Otherwise
+    the whole file is loaded with the stdlib json module.
+    
+    Args:
+        input_path: Path to the results JSON
+        
+    Returns:
+        Tuple of (tree_data, clusters_data), each empty if missing
+        
+    Raises:
+        ValueError: If the file is not valid JSON
+    """
+    try:
+        import ijson
+    except ImportError:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('tree', {}), data.get('clusters', {})
+    
+    try:
+        with open(input_path, 'rb') as f:
+            tree_data = next(ijson.items(f, 'tree', use_float=True), {})
+            f.seek(0)
+            clusters_data = next(ijson.items(f, 'clusters', use_float=True), {})
+    except ijson.JSONError as e:
+        raise ValueError(str(e)) from e
+    return tree_data, clusters_data
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate HTML tree viewer from cluster results JSON",
@@ -606,29 +1272,28 @@ def main():
         epilog=__doc__,
     )
     parser.add_argument("input_json", help="Input JSON file with cluster results (must include 'tree' and 'clusters')")
-    parser.add_argument("output_html", help="Output HTML file path")
+    parser.add_argument("output_html", help="Output HTML file path (gzip-compressed if it ends in .gz)")
+    parser.add_argument("--gzip", action="store_true", help="Write gzip-compressed HTML, appending .gz to the output path")
     
     args = parser.parse_args()
+    if args.gzip and not args.output_html.endswith('.gz'):
+        args.output_html += '.gz'
     
     # Read input JSON
     if not os.path.exists(args.input_json):
         print(f"Error: Input file not found: {args.input_json}", file=sys.stderr)
         sys.exit(1)
     
+    # Extract tree and clusters data
     try:
-        with open(args.input_json, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
+        tree_data, clusters_data = load_results(args.input_json)
+    except ValueError as e:
         print(f"Error: Invalid JSON in input file: {e}", file=sys.stderr)
         sys.exit(1)
     except Exception as e:
         print(f"Error reading input file: {e}", file=sys.stderr)
         sys.exit(1)
     
-    # Extract tree and clusters data
-    tree_data = data.get('tree', {})
-    clusters_data = data.get('clusters', {})
-    
     if not tree_data:
         print("Warning: No 'tree' data found in JSON. Tree viewer will be empty.", file=sys.stderr)
     
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup for the clustering script tests.
+
+The scripts in backend/scripts are run directly rather than installed as a package,
+and import each other as top-level modules, so the tests do the same.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
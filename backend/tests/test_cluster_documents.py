@@ -0,0 +1,146 @@
+"""Tests for scripts/cluster_documents.py."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import cluster_documents
+from cluster_documents import _mean_pool_chunks, extract_tree_structure, fetch_user_chunks
+
+CONDENSED_TREE_DTYPE = [('parent', np.intp), ('child', np.intp), ('lambda_val', float), ('child_size', np.intp)]
+
+
+def _clusterer(rows):
+    """Stand-in for a fitted HDBSCAN clusterer with the given condensed tree rows."""
+    tree_array = np.array(rows, dtype=CONDENSED_TREE_DTYPE)
+    return SimpleNamespace(condensed_tree_=SimpleNamespace(to_numpy=lambda: tree_array))
+
+
+# 12 points under root cluster 12: cluster 13 holds points 0-3, cluster 14 splits into
+# clusters 15 and 16 and also holds points 10 and 11 directly
+CONDENSED_TREE = [
+    (12, 13, 0.5, 4), (12, 14, 0.5, 6),
+    (13, 0, 0.6, 1), (13, 1, 0.7, 1), (13, 2, 0.8, 1), (13, 3, 0.8, 1),
+    (14, 15, 0.9, 3), (14, 16, 0.9, 3),
+    (15, 4, 1.0, 1), (15, 5, 1.2, 1), (15, 6, 1.1, 1),
+    (16, 7, 1.3, 1), (16, 8, 1.4, 1), (16, 9, 1.3, 1),
+    (14, 10, 0.7, 1), (14, 11, 0.75, 1),
+]
+CLUSTER_LABELS = np.array([0, 0, 0, -1, 1, 1, 1, 2, 2, -1, 3, 3])
+
+# Output of the original recursive implementation for CONDENSED_TREE and CLUSTER_LABELS
+EXPECTED_TREE = [{
+    'cluster_id': 12,
+    'lambda_val': 0.0,
+    'final_clusters': [0, 1, 2, 3],
+    'exclusive_clusters': [],
+    'children': [
+        {'cluster_id': 13, 'lambda_val': 0.5, 'final_clusters': [0], 'exclusive_clusters': [0], 'children': []},
+        {
+            'cluster_id': 14,
+            'lambda_val': 0.5,
+            'final_clusters': [1, 2, 3],
+            'exclusive_clusters': [3],
+            'children': [
+                {'cluster_id': 15, 'lambda_val': 0.9, 'final_clusters': [1], 'exclusive_clusters': [1], 'children': []},
+                {'cluster_id': 16, 'lambda_val': 0.9, 'final_clusters': [2], 'exclusive_clusters': [2], 'children': []},
+            ],
+        },
+    ],
+}]
+EXPECTED_CLUSTER_MAPPING = {12: [0, 1, 2, 3], 13: [0], 14: [1, 2, 3], 15: [1], 16: [2]}
+
+
+def test_extract_tree_structure_matches_recursive_output():
+    doc_ids = [f"doc{i}" for i in range(len(CLUSTER_LABELS))]
+    result = extract_tree_structure(_clusterer(CONDENSED_TREE), doc_ids, CLUSTER_LABELS)
+
+    assert result['tree'] == EXPECTED_TREE
+    assert result['cluster_mapping'] == EXPECTED_CLUSTER_MAPPING
+    assert result['total_edges'] == 4
+    assert result['edges'] == {
+        'parent': [12, 12, 14, 14],
+        'child': [13, 14, 15, 16],
+        'lambda_val': [0.5, 0.5, 0.9, 0.9],
+        'child_size': [4, 6, 3, 3],
+    }
+
+
+def test_extract_tree_structure_without_cluster_edges():
+    rows = [(3, 0, 0.5, 1), (3, 1, 0.5, 1), (3, 2, 0.5, 1)]
+    result = extract_tree_structure(_clusterer(rows), ["a", "b", "c"], np.array([-1, -1, -1]))
+
+    assert result == {
+        'tree': [],
+        'edges': {'parent': [], 'child': [], 'lambda_val': [], 'child_size': []},
+        'cluster_mapping': {},
+    }
+
+
+def test_mean_pool_chunks_matches_per_document_mean():
+    rng = np.random.default_rng(0)
+    chunk_doc_ids = ["b", "a", "c", "b", "a", "b", "z"]
+    vectors = rng.normal(size=(len(chunk_doc_ids), 8)).astype(np.float32)
+    vectors[6] = 0.0  # A zero vector is left unnormalized rather than divided by zero
+
+    doc_ids, doc_vectors, counts = _mean_pool_chunks(chunk_doc_ids, vectors)
+
+    assert doc_ids == ["a", "b", "c", "z"]
+    assert counts == [2, 3, 1, 1]
+    assert doc_vectors.dtype == np.float16
+    for doc_id, pooled in zip(doc_ids, doc_vectors):
+        mean = np.mean([v for d, v in zip(chunk_doc_ids, vectors) if d == doc_id], axis=0)
+        norm = np.linalg.norm(mean)
+        expected = mean / norm if norm > 0 else mean
+        np.testing.assert_allclose(pooled, expected, atol=1e-3)
+
+
+DOC_METADATA = {
+    'a': {'title': 'A', 'source': 'notion', 'tags': [], 'summary': None, 'updated_at': '2024-01-01'},
+    'b': {'title': 'B', 'source': 'notion', 'tags': [], 'summary': None, 'updated_at': '2024-02-01'},
+    'c': {'title': 'C', 'source': 'notion', 'tags': [], 'summary': None, 'updated_at': None},
+}
+EMBEDDING_CACHE = {
+    'a': (np.ones(4, dtype=np.float16), 2, '2024-01-01'),  # Unchanged
+    'b': (np.ones(4, dtype=np.float16), 3, '2023-12-01'),  # Edited since it was cached
+    'c': (np.ones(4, dtype=np.float16), 1, ''),  # Re-chunked since it was cached
+}
+
+
+@pytest.fixture
+def fetched_ids(monkeypatch):
+    """Stub out SQLite and the chunk fetch, recording which documents are fetched."""
+    fetched = []
+    monkeypatch.setattr(cluster_documents, 'get_user_documents', lambda db_path, user_id: DOC_METADATA)
+
+    def fetch_chunks_for_documents(client, document_ids, collection_name):
+        fetched.extend(document_ids)
+        return list(document_ids), np.zeros((len(document_ids), 4), dtype=np.float32), []
+
+    monkeypatch.setattr(cluster_documents, 'fetch_chunks_for_documents', fetch_chunks_for_documents)
+    return fetched
+
+
+def test_fetch_user_chunks_reuses_only_unchanged_cache_entries(monkeypatch, fetched_ids):
+    monkeypatch.setattr(
+        cluster_documents, 'fetch_chunk_counts', lambda client, document_ids, collection_name: {'a': 2, 'b': 3, 'c': 2},
+    )
+
+    _, _, _, cached_embeddings, _ = fetch_user_chunks(None, 'user', 'db', embedding_cache=EMBEDDING_CACHE)
+
+    assert list(cached_embeddings) == ['a']
+    assert fetched_ids == ['b', 'c']
+
+
+def test_fetch_user_chunks_ignores_cache_when_counting_fails(monkeypatch, fetched_ids):
+    def fetch_chunk_counts(client, document_ids, collection_name):
+        raise RuntimeError("aggregate query failed")
+
+    monkeypatch.setattr(cluster_documents, 'fetch_chunk_counts', fetch_chunk_counts)
+
+    _, chunk_doc_ids, _, cached_embeddings, _ = fetch_user_chunks(None, 'user', 'db', embedding_cache=EMBEDDING_CACHE)
+
+    assert cached_embeddings == {}
+    assert fetched_ids == list(DOC_METADATA)
+    assert chunk_doc_ids == list(DOC_METADATA)
@@ -0,0 +1,110 @@
+"""Tests for scripts/cluster_documents_by_chunks.py."""
+
+import numpy as np
+import pytest
+
+import cluster_documents_by_chunks
+from cluster_documents_by_chunks import (
+    fetch_user_chunks,
+    load_vector_cache,
+    map_chunk_clusters_to_documents,
+    save_vector_cache,
+)
+
+# Chunk cluster labels per document, interleaved below as the clustering would return them
+DOCUMENT_CHUNK_LABELS = {
+    'solid': [2, 2, 1],
+    'tie': [3, 1, 1, 3],  # Tied clusters resolve to the lowest cluster id
+    'noise_tie': [-1, 2],  # A tie between noise and a cluster resolves to the cluster
+    'noise': [-1, -1, 0],
+    'split': [0, 1, 2],  # No cluster reaches the majority threshold
+}
+
+
+@pytest.fixture
+def doc_clusters():
+    chunks_with_metadata = []
+    labels = []
+    for position in range(max(len(chunk_labels) for chunk_labels in DOCUMENT_CHUNK_LABELS.values())):
+        for doc_id, chunk_labels in DOCUMENT_CHUNK_LABELS.items():
+            if position < len(chunk_labels):
+                chunks_with_metadata.append((doc_id, position))
+                labels.append(chunk_labels[position])
+    doc_metadata = {doc_id: {'title': doc_id.title(), 'source': 'notion'} for doc_id in DOCUMENT_CHUNK_LABELS}
+    return map_chunk_clusters_to_documents(chunks_with_metadata, np.array(labels), doc_metadata, 0.5)
+
+
+@pytest.mark.parametrize("doc_id, cluster_id, primary_cluster, primary_ratio", [
+    ('solid', 2, 2, 2 / 3),
+    ('tie', 1, 1, 0.5),
+    ('noise_tie', 2, 2, 0.5),
+    ('noise', -1, -1, 2 / 3),
+    ('split', -1, 0, 1 / 3),
+])
+def test_map_chunk_clusters_to_documents_assignment(doc_clusters, doc_id, cluster_id, primary_cluster, primary_ratio):
+    doc = doc_clusters[doc_id]
+    assert doc['cluster_id'] == cluster_id
+    assert doc['primary_cluster'] == primary_cluster
+    assert doc['primary_cluster_ratio'] == pytest.approx(primary_ratio)
+
+
+def test_map_chunk_clusters_to_documents_details(doc_clusters):
+    assert sorted(doc_clusters) == sorted(DOCUMENT_CHUNK_LABELS)
+    for doc_id, chunk_labels in DOCUMENT_CHUNK_LABELS.items():
+        doc = doc_clusters[doc_id]
+        assert doc['title'] == doc_id.title()
+        assert doc['source'] == 'notion'
+        assert doc['chunk_count'] == len(chunk_labels)
+        assert doc['chunk_cluster_distribution'] == {
+            label: chunk_labels.count(label) for label in set(chunk_labels)
+        }
+
+
+def _chunk(doc_id, chunk_idx=0):
+    return (doc_id, chunk_idx, np.full(4, chunk_idx, dtype=np.float32))
+
+
+@pytest.fixture
+def user_documents(monkeypatch):
+    """Stub out SQLite and the chunk fetch for a user who now has documents 'kept' and 'new'."""
+    updated = {'kept': '2024-01-01', 'new': '2024-03-01'}
+    fetched = []
+
+    def stream_user_documents(conn, user_id, doc_metadata):
+        for doc_id, updated_at in updated.items():
+            doc_metadata[doc_id] = {'title': doc_id, 'source': 'notion', 'updated_at': updated_at}
+            yield doc_id
+
+    def fetch_chunks_for_documents(client, document_ids, collection_name):
+        document_ids = list(document_ids)
+        fetched.extend(document_ids)
+        return [_chunk(doc_id) for doc_id in document_ids]
+
+    monkeypatch.setattr(cluster_documents_by_chunks, 'stream_user_documents', stream_user_documents)
+    monkeypatch.setattr(cluster_documents_by_chunks, 'fetch_chunks_for_documents', fetch_chunks_for_documents)
+    return fetched
+
+
+def test_fetch_user_chunks_prunes_deleted_documents_from_vector_cache(tmp_path, user_documents):
+    cache_path = str(tmp_path / "vectors.npz")
+    save_vector_cache(cache_path, 'Chunks', {
+        'kept': ('2024-01-01', [_chunk('kept', 0), _chunk('kept', 1)]),
+        'deleted': ('2024-01-01', [_chunk('deleted')]),
+    })
+
+    _, chunks = fetch_user_chunks(None, 'user', None, collection_name='Chunks', vector_cache_path=cache_path)
+
+    assert user_documents == ['new']
+    assert sorted((doc_id, chunk_idx) for doc_id, chunk_idx, _ in chunks) == [('kept', 0), ('kept', 1), ('new', 0)]
+    cache = load_vector_cache(cache_path, 'Chunks')
+    assert sorted(cache) == ['kept', 'new']
+    assert cache['new'][0] == '2024-03-01'
+
+
+def test_save_vector_cache_removes_emptied_cache(tmp_path):
+    cache_path = str(tmp_path / "vectors.npz")
+    save_vector_cache(cache_path, 'Chunks', {'deleted': ('', [_chunk('deleted')])})
+
+    save_vector_cache(cache_path, 'Chunks', {})
+
+    assert not (tmp_path / "vectors.npz").exists()
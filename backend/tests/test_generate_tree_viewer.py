@@ -0,0 +1,167 @@
+"""Tests for scripts/generate_tree_viewer.py."""
+
+import json
+
+from generate_tree_viewer import (
+    CLUSTER_SHARDS,
+    DOCUMENT_PREVIEW_LIMIT,
+    _pack_clusters,
+    _referenced_cluster_ids,
+    _split_cluster,
+    _write_cluster_shards,
+)
+
+DOCUMENT_FIELDS = ('title', 'source', 'documentId', 'chunkCount')
+
+
+def _unpack(strings, packed):
+    """Unpack clusters the way the page's unpackCluster does."""
+    def string(i):
+        return None if i is None else strings[i]
+
+    clusters = {}
+    for cluster_id, entry in packed.items():
+        info = {}
+        if 'titles' in entry:
+            info['titles'] = [string(i) for i in entry['titles']]
+        if 'documents' in entry:
+            columns = entry['documents']
+            info['documents'] = [
+                {
+                    'title': string(columns['title'][i]),
+                    'source': string(columns['source'][i]),
+                    'documentId': string(columns['documentId'][i]),
+                    'chunkCount': columns['chunkCount'][i],
+                }
+                for i in range(len(columns['title']))
+            ]
+        if 'total' in entry:
+            info['total'] = entry['total']
+        clusters[cluster_id] = info
+    return clusters
+
+
+def _read_script(path, callback):
+    """Arguments of the single page function call a shard script makes."""
+    script = path.read_text(encoding='utf-8')
+    prefix, suffix = f"{callback}(", ");\n"
+    assert script.startswith(prefix) and script.endswith(suffix)
+    return json.loads("[" + script[len(prefix):-len(suffix)] + "]")
+
+
+def _shown_documents(info):
+    """Documents as the page shows them: title-only strings become dicts, other fields are dropped."""
+    documents = [{'title': doc} if isinstance(doc, str) else doc for doc in info.get('documents') or []]
+    return [{field: doc.get(field) for field in DOCUMENT_FIELDS} for doc in documents]
+
+
+def test_pack_clusters_round_trip():
+    clusters = {
+        '0': {
+            'titles': ['Alpha', 'Beta'],
+            'documents': [
+                {'documentId': 'd1', 'title': 'Alpha', 'source': 'notion', 'chunkCount': 3, 'tags': ['x']},
+                {'documentId': 'd2', 'title': 'Beta', 'source': 'notion', 'chunkCount': 1},
+            ],
+            'size': 2,
+        },
+        '7': {
+            'titles': ['Alpha', 'Untitled'],
+            'documents': ['Alpha', {'documentId': 'd3', 'source': None}],
+        },
+        '9': {'titles': []},
+    }
+
+    strings, packed = _pack_clusters(clusters)
+
+    # Repeated titles and sources are stored once
+    assert len(strings) == len(set(strings))
+    assert sorted(strings) == sorted(['Alpha', 'Beta', 'Untitled', 'notion', 'd1', 'd2', 'd3'])
+
+    unpacked = _unpack(strings, packed)
+    assert unpacked.keys() == clusters.keys()
+    for cluster_id, info in clusters.items():
+        assert unpacked[cluster_id].get('titles') == info.get('titles')
+        assert unpacked[cluster_id].get('documents', []) == _shown_documents(info)
+
+
+def test_split_cluster_truncates_to_preview_and_round_trips():
+    count = DOCUMENT_PREVIEW_LIMIT + 5
+    info = {
+        'titles': [f"Title {i}" for i in range(count)],
+        'documents': [
+            {'documentId': f"d{i}", 'title': f"Title {i}", 'source': 'notion', 'chunkCount': i} for i in range(count)
+        ],
+    }
+
+    head, rest = _split_cluster(info)
+
+    assert head['total'] == {'titles': count, 'documents': count}
+    assert len(head['titles']) == len(head['documents']) == DOCUMENT_PREVIEW_LIMIT
+    assert len(rest['titles']) == len(rest['documents']) == 5
+
+    # The page appends a cluster's detail script to its shard entry
+    strings, packed = _pack_clusters({'4': head})
+    detail_strings, detail_packed = _pack_clusters({'4': rest})
+    shown = _unpack(strings, packed)['4']
+    more = _unpack(detail_strings, detail_packed)['4']
+    assert shown['total'] == {'titles': count, 'documents': count}
+    assert 'total' not in more
+    assert shown['titles'] + more['titles'] == info['titles']
+    assert shown['documents'] + more['documents'] == _shown_documents(info)
+
+
+def test_split_cluster_keeps_small_clusters_whole():
+    info = {
+        'titles': [f"Title {i}" for i in range(DOCUMENT_PREVIEW_LIMIT)],
+        'documents': [f"Title {i}" for i in range(DOCUMENT_PREVIEW_LIMIT)],
+    }
+
+    head, rest = _split_cluster(info)
+
+    assert head is info
+    assert rest is None
+
+
+def test_write_cluster_shards_groups_clusters_by_shard(tmp_path):
+    clusters = {
+        '1': {'titles': ['One']},
+        str(CLUSTER_SHARDS + 1): {'titles': ['Shared shard']},
+        '3': {'titles': ['Three'], 'documents': [{'documentId': 'd3', 'title': 'Three', 'source': 'notion'}]},
+    }
+    # Files from an earlier run are removed; unrelated files are left alone
+    for name in ('shard-5.js', 'detail-5.js', 'search-5.js', 'notes.txt'):
+        (tmp_path / name).write_text("stale")
+
+    written = _write_cluster_shards(clusters, str(tmp_path))
+
+    assert written == [1, 3]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'notes.txt', 'search-1.js', 'search-3.js', 'shard-1.js', 'shard-3.js',
+    ]
+    for shard in written:
+        strings, packed = _read_script(tmp_path / f"shard-{shard}.js", 'registerClusters')
+        expected = {cluster_id for cluster_id in clusters if int(cluster_id) % CLUSTER_SHARDS == shard}
+        assert set(packed) == expected
+        unpacked = _unpack(strings, packed)
+        for cluster_id in expected:
+            assert unpacked[cluster_id]['titles'] == clusters[cluster_id]['titles']
+            assert unpacked[cluster_id].get('documents', []) == _shown_documents(clusters[cluster_id])
+
+
+def test_referenced_cluster_ids():
+    tree = [{
+        'cluster_id': 10,
+        'final_clusters': [0, 1, 2],
+        'exclusive_clusters': [2],
+        'children': [
+            {'cluster_id': 11, 'final_clusters': [0], 'exclusive_clusters': [0], 'children': []},
+            {'cluster_id': 12, 'final_clusters': [1], 'exclusive_clusters': [], 'children': []},
+            {'cluster_id': 13, 'children': []},  # Written without cluster mappings
+        ],
+    }]
+
+    # Parents show their exclusive clusters and leaves their final clusters
+    assert _referenced_cluster_ids(tree, needs_fallback=False) == {'0', '1', '2'}
+    # Nodes without mapped clusters show their own cluster only with the fallback
+    assert _referenced_cluster_ids(tree, needs_fallback=True) == {'0', '1', '2', '13'}